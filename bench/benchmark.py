@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+
+import argparse, contextlib, functools, gc, json, os, platform, re, sys, tempfile, time, tracemalloc
+import cv2 as cv
+import numpy as np
+
+# Classes of all labs are imported from their directories, modules shared by them from common one
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for lab in ("lab5", "lab4", "lab3", "lab2", "lab1", "common"):
+    sys.path.insert(0, os.path.join(ROOT, lab))
+
+import greyscale
+from edgefinder import EdgeFinder
+from edgestrength import EdgeStrength
+from pipeline import Pipeline
+from pyramid import EdgePyramid
+from shadefix import ShadeFix
+from shiftvector import ShiftVector
+from tracker import Tracker
+
+# Image sizes (height, width)
+SIZES = {
+    "vga": (480, 640),
+    "hd":  (720, 1280),
+    "fhd": (1080, 1920),
+    "4k":  (2160, 3840),
+    "8k":  (4320, 7680),
+}
+SIZE_ORDER = ["vga", "hd", "fhd", "4k", "8k"]
+
+# Data types of input image: BGR uint8 image or greyscale float image
+DTYPES = ["uint8", "float"]
+
+# Threads of multi-threaded operations
+THREADS = os.cpu_count()
+
+class Case:
+    """
+    Benchmark of one operation
+
+    :ivar    name:      Name of operation
+    :vartype name:      str
+    :ivar    prepare:   Function creating timed function from input image
+    :vartype prepare:   function
+    :ivar    dtypes:    Supported data types of input image
+    :vartype dtypes:    list
+    :ivar    maxSize:   Largest supported size of input image
+    :vartype maxSize:   str
+    :ivar    reference: Name of operation which this one is compared to (speedup is reported)
+    :vartype reference: str
+    """
+    def __init__(self, name, prepare, dtypes = DTYPES, maxSize = "8k", reference = None):
+        self.name = name
+        self.prepare = prepare
+        self.dtypes = dtypes
+        self.maxSize = maxSize
+        self.reference = reference
+
+    def supports(self, size, dtype):
+        """
+        Checking if operation is benchmarked on input image
+
+        :param size:  Size of input image
+        :type  size:  str
+        :param dtype: Data type of input image
+        :type  dtype: str
+        :rtype:       bool
+        """
+        return dtype in self.dtypes and SIZE_ORDER.index(size) <= SIZE_ORDER.index(self.maxSize)
+
+_images = {}
+
+def syntheticImage(size, dtype, shift = (0, 0)):
+    """
+    Creating deterministic image with smooth shades, sharp edges and noise
+
+    :param size:  Size of image
+    :type  size:  str
+    :param dtype: "uint8" for BGR image, "float" for greyscale float image
+    :type  dtype: str
+    :param shift: Shift of image content (rows, columns)
+    :type  shift: tuple
+    :return:      Image
+    :rtype:       numpy
+    """
+    key = (size, dtype, shift)
+    if key not in _images:
+        height, width = SIZES[size]
+        y = np.arange(height)[:,None] - shift[0]
+        x = np.arange(width)[None,:] - shift[1]
+        rng = np.random.RandomState(0)
+
+        # Smooth shades with checkerboard edges
+        channels = []
+        for phase in (0.0, 1.0, 2.0):
+            shade = 110 + 60 * np.sin(x / 37.0 + phase) * np.cos(y / 53.0 - phase)
+            shade = shade + 50 * (((x // 64) + (y // 64)) % 2)
+            channels.append(shade)
+        img = np.dstack(channels) + rng.randint(-8, 9, (height, width, 1))
+        img = np.clip(img, 0, 255).astype(np.uint8)
+
+        if dtype == "float":
+            img = greyscale.toGreyscale(img).astype(np.float64)
+        _images[key] = img
+
+    return _images[key]
+
+def method(cls, name, *args, before = ()):
+    """
+    Creating preparation of benchmark which calls method of class
+
+    :param cls:    Class of object (or function creating it from image)
+    :type  cls:    type
+    :param name:   Name of method
+    :type  name:   str
+    :param args:   Arguments of method
+    :type  args:   tuple
+    :param before: Methods (with arguments) called before timed one
+    :type  before: tuple
+    :return:       Preparation function
+    :rtype:        function
+    """
+    def prepare(img, size, dtype):
+        obj = cls(img)
+        for step in before:
+            getattr(obj, step[0])(*step[1:])
+        return lambda: getattr(obj, name)(*args)
+    return prepare
+
+def shiftVectors(img, size, dtype):
+    """
+    Preparing search of shift vectors between two shifted frames
+    """
+    frames = [greyscale.toGreyscale(syntheticImage(size, dtype, shift)) for shift in ((0, 0), (3, 5))]
+    sv = ShiftVector(frames, 8, 32, 8, show=False)
+    return sv.find_vectors
+
+def findObject(img, size, dtype):
+    """
+    Preparing tracking of object over five shifted frames
+    """
+    frames = [syntheticImage(size, dtype, (2 * i, 3 * i)) for i in range(5)]
+    height, width = SIZES[size]
+    coord = [width // 2 - 32, height // 2 - 32, width // 2 + 32, height // 2 + 32]
+    tracker = Tracker(frames, 0, len(frames), coord)
+    def run():
+        # Tracker reports every frame
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            tracker.find_object()
+    return run
+
+def makeHistogram(img, size, dtype):
+    """
+    Preparing drawing and saving of histogram
+    """
+    sf = ShadeFix(img)
+    path = os.path.join(tempfile.gettempdir(), "benchmark_hist.png")
+    return lambda: sf.makeHistogram("Histogram", path)
+
+def strengthSteps(img, size, dtype):
+    """
+    Preparing all images of lab3/main.py made by EdgeStrength methods one after another
+    """
+    es = EdgeStrength(img)
+    def run():
+        es.restoreImage()
+        es.laplacianEdges(1024)
+        for smoothing in (es.gaussSmoothing, es.gaussSmoothingTwice):
+            es.restoreImage()
+            smoothing()
+            es.laplacianEdges(1024)
+            es._lsLaplacian(0.7)
+            es.strengtheningEdges()
+    return run
+
+def strengthPipeline(img, size, dtype):
+    """
+    Preparing all images of lab3/main.py made by one evaluation of pipeline
+    """
+    pipeline = Pipeline(img)
+    grey = pipeline.source
+    nodes = [grey.laplacian().lsLaplacian()]
+    for square in (3, 5):
+        lap = grey.smooth(square).laplacian().lsLaplacian()
+        nodes += [grey.smooth(square), lap, lap.lsLaplacian(0.7).strengthen()]
+    return lambda: pipeline.evaluate(nodes)
+
+CASES = [
+    Case("greyscale.toGreyscale", lambda img, size, dtype: lambda: greyscale.toGreyscale(img), ["uint8"]),
+    Case("ShadeFix.getShadeMap", method(ShadeFix, "getShadeMap")),
+    Case("ShadeFix.linearStretching", method(ShadeFix, "linearStretching", before=[("normalizeShadeMap",)])),
+    Case("ShadeFix.histogramEqualization", method(ShadeFix, "histogramEqualization")),
+    Case("ShadeFix.adaptiveEqualization", method(ShadeFix, "adaptiveEqualization")),
+    Case("ShadeFix.makeHistogram", makeHistogram),
+    Case("EdgeFinder.findEdges[sobel]", method(EdgeFinder, "findEdges", "sobel")),
+    Case("EdgeFinder.findEdges[prewitt]", method(EdgeFinder, "findEdges", "prewitt")),
+    Case("EdgeFinder.findEdges[roberts]", method(EdgeFinder, "findEdges", "roberts")),
+    Case("EdgeFinder.findEdges[sobel,float32]", method(functools.partial(EdgeFinder, precision="float32"),
+        "findEdges", "sobel")),
+    Case("EdgeFinder.findEdges[sobel,int16]", method(functools.partial(EdgeFinder, precision="int16"),
+        "findEdges", "sobel"), ["uint8"]),
+    Case("EdgeFinder.findEdges[sobel,threads]", method(functools.partial(EdgeFinder, threads=THREADS),
+        "findEdges", "sobel"), reference="EdgeFinder.findEdges[sobel]"),
+    Case("EdgeFinder.findEdgesMulti", method(EdgeFinder, "findEdgesMulti", ["sobel", "prewitt", "roberts"])),
+    Case("EdgeFinder.gradientMaps", method(EdgeFinder, "gradientMaps", "sobel")),
+    Case("EdgeFinder.cannyEdges", method(EdgeFinder, "cannyEdges", 100, 200)),
+    Case("EdgePyramid.findEdges[level 2]", method(EdgePyramid, "findEdges", "sobel", 2, before=[("level", 2)]),
+        reference="EdgeFinder.findEdges[sobel]"),
+    Case("EdgePyramid.preview", method(EdgePyramid, "findEdges", "sobel", 2), reference="EdgeFinder.findEdges[sobel]"),
+    Case("EdgeStrength.gaussSmoothing", method(EdgeStrength, "gaussSmoothing")),
+    Case("EdgeStrength.gaussSmoothingTwice", method(EdgeStrength, "gaussSmoothingTwice")),
+    Case("EdgeStrength.gaussFilter[sigma 2]", method(EdgeStrength, "gaussFilter", 2)),
+    Case("EdgeStrength.gaussFilter[sigma 8]", method(EdgeStrength, "gaussFilter", 8)),
+    Case("EdgeStrength.boxFilter[radius 2]", method(EdgeStrength, "boxFilter", 2)),
+    Case("EdgeStrength.boxFilter[radius 32]", method(EdgeStrength, "boxFilter", 32)),
+    Case("EdgeStrength.boxGaussSmoothing[sigma 8]", method(EdgeStrength, "boxGaussSmoothing", 8)),
+    Case("EdgeStrength.localStatistics", method(EdgeStrength, "localStatistics", 8)),
+    Case("EdgeStrength.laplacianEdges", method(EdgeStrength, "laplacianEdges", 1024)),
+    Case("EdgeStrength.laplacianEdges[log]", method(EdgeStrength, "laplacianEdges", 1024, "log")),
+    Case("EdgeStrength.laplacianEdges[dog]", method(EdgeStrength, "laplacianEdges", 1024, "dog")),
+    Case("EdgeStrength.main", strengthSteps),
+    Case("Pipeline.evaluate[main]", strengthPipeline, reference="EdgeStrength.main"),
+    Case("EdgeStrength.strengtheningEdges", method(EdgeStrength, "strengtheningEdges",
+        before=[("laplacianEdges", 0.7)])),
+    Case("ShiftVector.find_vectors", shiftVectors, ["uint8"], "vga"),
+    Case("Tracker.find_object", findObject, ["uint8"], "vga"),
+]
+
+def runCase(case, size, dtype, repeat):
+    """
+    Timing operation on input image and measuring its peak memory
+
+    :param case:   Benchmark
+    :type  case:   Case
+    :param size:   Size of input image
+    :type  size:   str
+    :param dtype:  Data type of input image
+    :type  dtype:  str
+    :param repeat: Amount of timed runs
+    :type  repeat: int
+    :return:       Result of benchmark
+    :rtype:        dict
+    """
+    img = syntheticImage(size, dtype)
+    times = []
+    for _ in range(repeat):
+        run = case.prepare(img, size, dtype)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Memory is measured in separate run, tracing slows allocations down
+    run = case.prepare(img, size, dtype)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "case": case.name,
+        "size": size,
+        "dtype": dtype,
+        "seconds": min(times),
+        "median": float(np.median(times)),
+        "peakBytes": peak,
+    }
+
+def resultKey(result):
+    """
+    Creating key of result which is the same in all runs
+
+    :param result: Result of benchmark
+    :type  result: dict
+    :return:       Key
+    :rtype:        str
+    """
+    return "{}/{}/{}".format(result["case"], result["size"], result["dtype"])
+
+def compare(results, baseline, threshold):
+    """
+    Finding operations which became slower than in baseline
+
+    :param results:   Current results
+    :type  results:   list
+    :param baseline:  Baseline results
+    :type  baseline:  list
+    :param threshold: Allowed relative slowdown
+    :type  threshold: float
+    :return:          Pairs of current result and its slowdown
+    :rtype:           list
+    """
+    base = {resultKey(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = base.get(resultKey(result))
+        if old is None:
+            continue
+        slowdown = result["seconds"] / old["seconds"] - 1
+        if slowdown > threshold:
+            regressions.append((result, slowdown))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of image operations of all labs")
+    parser.add_argument("-s", "--sizes", default=",".join(SIZE_ORDER), help="comma separated sizes: " + ", ".join(SIZE_ORDER))
+    parser.add_argument("-d", "--dtypes", default=",".join(DTYPES), help="comma separated data types: " + ", ".join(DTYPES))
+    parser.add_argument("-k", "--filter", default="", help="regular expression for names of operations")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs of every operation")
+    parser.add_argument("-o", "--out", default="bench_results.json", help="results file")
+    parser.add_argument("-b", "--baseline", help="baseline results file to compare with")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1, help="allowed relative slowdown against baseline")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(",")
+    dtypes = args.dtypes.split(",")
+    results = []
+    for case in CASES:
+        if not re.search(args.filter, case.name):
+            continue
+        for size in sizes:
+            for dtype in dtypes:
+                if not case.supports(size, dtype):
+                    continue
+                result = runCase(case, size, dtype, args.repeat)
+                results.append(result)
+                print("{:<40} {:<4} {:<6} {:10.4f}s {:10.1f} MiB".format(case.name, size, dtype,
+                    result["seconds"], result["peakBytes"] / 2**20), flush=True)
+
+                # Speedup against reference operation if it was run
+                reference = [old for old in results if old["case"] == case.reference
+                    and old["size"] == size and old["dtype"] == dtype]
+                if reference:
+                    result["speedup"] = reference[0]["seconds"] / result["seconds"]
+                    print("{:<40} speedup {:.2f}x over {} ({} threads)".format("", result["speedup"],
+                        case.reference, THREADS), flush=True)
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "meta": {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "opencv": cv.__version__,
+                "machine": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "results": results,
+        }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for result, slowdown in regressions:
+            print("Regression: {} is {:.0%} slower".format(resultKey(result), slowdown))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
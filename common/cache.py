@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import functools
+import greyscale
+import hashlib
+import inspect
+import numpy as np
+import os
+import tempfile
+
+# Directory of cache (cache is disabled without it) and limit of its size in bytes
+CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR")
+CACHE_BYTES = int(os.environ.get("IMAGE_CACHE_BYTES", 1 << 30))
+
+class ArrayCache:
+    """
+    Content-addressed cache of arrays in ".npy" files. Files are memory-mapped when they are read,
+    the least recently used ones are removed when size of cache exceeds its budget
+
+    :ivar    directory: Directory of files
+    :vartype directory: str
+    :ivar    budget:    Limit of size of all files in bytes
+    :vartype budget:    int
+    """
+    def __init__(self, directory, budget = 1 << 30):
+        self.directory = directory
+        self.budget = budget
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        """
+        Getting array from cache
+
+        :param key: Key of array
+        :type  key: str
+        :return:    Read-only memory-mapped array or None if it is not cached
+        :rtype:     numpy
+        """
+        path = self._path(key)
+        try:
+            # Time of modification is time of last use
+            os.utime(path)
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, array):
+        """
+        Adding array to cache and removing the least recently used arrays over budget
+
+        :param key:   Key of array
+        :type  key:   str
+        :param array: Array
+        :type  array: numpy
+        """
+        if array.nbytes > self.budget:
+            return
+        # Other processes and threads never read partially written file
+        # (every writer has its own temporary file)
+        fd, tmpPath = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmpPath, self._path(key))
+        except OSError:
+            # Other writer of the same content won the race
+            try:
+                os.remove(tmpPath)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        """
+        Removing the least recently used files until cache fits its budget
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for _, fileSize, path in sorted(entries):
+            if size <= self.budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= fileSize
+
+    def clear(self):
+        """
+        Removing all arrays
+        """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                os.remove(entry.path)
+
+# Cache configured by environment (created with the first use)
+_cache = None
+
+def getCache():
+    """
+    Getting cache configured by IMAGE_CACHE_DIR and IMAGE_CACHE_BYTES environment variables
+
+    :return: Cache or None if it is disabled
+    :rtype:  ArrayCache
+    """
+    global _cache
+    if _cache is None and CACHE_DIR:
+        _cache = ArrayCache(CACHE_DIR, CACHE_BYTES)
+
+    return _cache
+
+def digest(*parts):
+    """
+    Hashing content of arrays and values of other parts
+
+    :param parts: Arrays, strings, numbers or tuples of them
+    :type  parts: tuple
+    :return:      Hexadecimal digest
+    :rtype:       str
+    """
+    sha = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            sha.update("{}{}".format(part.shape, part.dtype.str).encode())
+            sha.update(np.ascontiguousarray(part).data)
+        elif isinstance(part, bytes):
+            sha.update(part)
+        else:
+            sha.update(repr(part).encode())
+        sha.update(b"\0")
+
+    return sha.hexdigest()
+
+def get(key):
+    """
+    Getting array from cache
+
+    :param key: Key of array (None if it is unknown)
+    :type  key: str
+    :return:    Read-only array or None if it is not cached or cache is disabled
+    :rtype:     numpy
+    """
+    cache = getCache()
+    if cache is None or key is None:
+        return None
+
+    return cache.get(key)
+
+def put(key, array):
+    """
+    Adding array to cache (nothing is done if cache is disabled or key is unknown)
+
+    :param key:   Key of array
+    :type  key:   str
+    :param array: Array
+    :type  array: numpy
+    """
+    cache = getCache()
+    if cache is not None and key is not None:
+        cache.put(key, array)
+
+def imageKey(img, *params):
+    """
+    Key of image made of its content (and of parameters of object using it)
+
+    :param img:    Image
+    :type  img:    numpy
+    :param params: Parameters changing results of operations on image
+    :type  params: tuple
+    :return:       Key or None if cache is disabled
+    :rtype:        str
+    """
+    if getCache() is None:
+        return None
+
+    return digest(img, *params)
+
+def loadGreyscale(inImg):
+    """
+    Loading image (or using already loaded one) and converting it to greyscale.
+    Greyscale image of file is cached with digest of file content, so next loading
+    of the same file does not decode it
+
+    :param inImg: Path to image or image
+    :type  inImg: str or numpy
+    :return:      Greyscale image or None if image can't be read
+    :rtype:       numpy
+    """
+    key = None
+    if getCache() is not None and not isinstance(inImg, np.ndarray):
+        try:
+            with open(inImg, "rb") as f:
+                key = digest(f.read(), "greyscale")
+        except OSError:
+            return None
+        img = get(key)
+        if img is not None:
+            return np.array(img)
+
+    img = inImg if isinstance(inImg, np.ndarray) else cv.imread(inImg)
+    if img is not None and len(img.shape) == 3:
+        img = greyscale.toGreyscale(img)
+        put(key, img)
+
+    return img
+
+def resultKey(obj, name, *args):
+    """
+    Key of result of operation on current image of object
+
+    :param obj:  Object with current image (inImg), its key (_key, valid while inImg is _keyImg)
+                 and optionally _keyKernels(name, args) giving kernels of operation
+    :type  obj:  object
+    :param name: Name of operation
+    :type  name: str
+    :param args: All arguments of operation
+    :type  args: tuple
+    :return:     Key or None if key of current image is unknown
+    :rtype:      str
+    """
+    # Current image was replaced from outside of cached steps
+    if getattr(obj, "_key", None) is None or obj._keyImg is not obj.inImg:
+        return None
+    # Registered kernels used by operation can be replaced, so key has their coefficients
+    keyKernels = getattr(obj, "_keyKernels", None)
+    if keyKernels is not None:
+        args += tuple(keyKernels(name, args))
+
+    return digest(obj._key, name, *args)
+
+def _stepKey(obj, method, args, kwargs):
+    """
+    Key of result of method called on current image of object
+
+    :rtype: str
+    """
+    # Default arguments have the same key as given ones
+    bound = inspect.signature(method).bind(obj, *args, **kwargs)
+    bound.apply_defaults()
+
+    return resultKey(obj, method.__name__, *list(bound.arguments.values())[1:])
+
+def cachedStep(method):
+    """
+    Decorator of operation replacing current image of object (inImg). Result is taken from cache
+    if it is there (object loads it with _loadCached()), otherwise operation is done and its
+    result is cached. Key of result is made of key of current image (_key, valid while inImg
+    is _keyImg), name of method and its arguments
+
+    :param method: Method changing current image and returning nothing
+    :type  method: function
+    :rtype:        function
+    """
+    @functools.wraps(method)
+    def wrapper(obj, *args, **kwargs):
+        if getCache() is None:
+            return method(obj, *args, **kwargs)
+
+        key = _stepKey(obj, method, args, kwargs)
+        stored = get(key)
+        if stored is not None:
+            obj._loadCached(stored)
+        else:
+            method(obj, *args, **kwargs)
+            put(key, obj.inImg)
+        obj._key, obj._keyImg = key, obj.inImg
+
+    return wrapper
+
+def keyedStep(method):
+    """
+    Decorator of cheap operation replacing current image of object. Its result is not cached,
+    only key of current image is updated, so next cached steps know their input
+
+    :param method: Method changing current image
+    :type  method: function
+    :rtype:        function
+    """
+    @functools.wraps(method)
+    def wrapper(obj, *args, **kwargs):
+        if getCache() is None:
+            return method(obj, *args, **kwargs)
+
+        key = _stepKey(obj, method, args, kwargs)
+        result = method(obj, *args, **kwargs)
+        obj._key, obj._keyImg = key, obj.inImg
+
+        return result
+
+    return wrapper
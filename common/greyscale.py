@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+# Amount of pixels converted at once (keeps temporary arrays in cache)
+CHUNK = 1 << 15
+
+# Weights of blue, green and red channel
+WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+def toGreyscale(img, out = None):
+    """
+    Converting BGR image to greyscale with shades 0.299 R + 0.587 G + 0.114 B
+
+    Shades are weighted sums in float32 truncated after adding 0.5 ± 0.0005. Exact shade
+    299 R + 587 G + 114 B / 1000 is at least 0.001 from half of shade unless it is tied,
+    so both truncations are the rounded shade. They differ only for tied pixels (about 0.1 %
+    of colors), which are computed again by the original float64 expression, so they are
+    rounded exactly as they were
+
+    :param img: BGR image
+    :type  img: numpy
+    :param out: Preallocated greyscale image (uint8, height x width)
+    :type  out: numpy
+    :return:    Greyscale image (uint8)
+    :rtype:     numpy
+    """
+    if len(img.shape) != 3 or img.shape[2] != 3:
+        raise ValueError("BGR image expected, got shape {}".format(img.shape))
+    height, width = img.shape[0], img.shape[1]
+    count = height * width
+    if out is None:
+        out = np.empty((height, width), dtype=np.uint8)
+    elif out.shape != (height, width) or out.dtype != np.uint8 or not out.flags.c_contiguous:
+        raise ValueError("Output must be contiguous uint8 array of shape {}".format((height, width)))
+    if count == 0:
+        return out
+
+    pixels = np.ascontiguousarray(img, dtype=np.uint8).reshape(count, 3)
+    res = out.reshape(-1)
+
+    # Scratch arrays of one chunk
+    size = min(CHUNK, count)
+    colors = np.empty((size, 3), dtype=np.float32)
+    shades = np.empty(size, dtype=np.float32)
+    lower = np.empty(size, dtype=np.uint8)
+    for start in range(0, count, CHUNK):
+        end = min(start + CHUNK, count)
+        n = end - start
+        colors[:n] = pixels[start:end]
+        np.matmul(colors[:n], WEIGHTS, out=shades[:n])
+        # Rounding up and down of ties
+        shades[:n] += np.float32(0.5005)
+        res[start:end] = shades[:n]
+        shades[:n] -= np.float32(0.001)
+        lower[:n] = shades[:n]
+
+        tied = np.flatnonzero(res[start:end] != lower[:n])
+        if len(tied) > 0:
+            tie = pixels[start + tied]
+            res[start + tied] = np.round(0.299 * tie[:, 2] + 0.587 * tie[:, 1] + 0.114 * tie[:, 0])
+
+    return out
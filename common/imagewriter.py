@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import numpy as np
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+def toShades(img):
+    """
+    Converting image to 8-bit shades with rounding and saturation (as image encoder does)
+
+    :param img: Image of any data type
+    :type  img: numpy
+    :return:    New uint8 image
+    :rtype:     numpy
+    """
+    if img.dtype == np.uint8:
+        return img.copy()
+
+    shades = np.empty(img.shape, dtype=np.uint8)
+    if np.issubdtype(img.dtype, np.floating):
+        img = np.rint(img)
+    np.clip(img, 0, 255, out=shades, casting="unsafe")
+
+    return shades
+
+class ImageWriter:
+    """
+    Pool of threads encoding and saving images in background. Image is converted to 8 bits
+    when it is passed, so caller can change its array right after that. Amount of images
+    waiting for encoding is limited, caller waits for free place when it is reached
+
+    :ivar    threads:     Amount of encoding threads
+    :vartype threads:     int
+    :ivar    compression: PNG compression level (0 - 9, None for default one)
+    :vartype compression: int
+    :ivar    ext:         Extension replacing extension of saved files (".bmp" is the fastest one),
+                          None keeps extensions
+    :vartype ext:         str
+    :ivar    pending:     Maximum amount of passed images which are not saved yet
+    :vartype pending:     int
+    """
+    def __init__(self, threads = 2, compression = None, ext = None, pending = None):
+        self.threads = threads
+        self.compression = compression
+        self.ext = ext
+        self.pending = pending or 2 * threads
+        self._pool = ThreadPoolExecutor(threads)
+        # Places of images which are not saved yet
+        self._slots = threading.BoundedSemaphore(self.pending)
+        # Writes which are not finished or failed and not checked by flush() yet (in order of writing)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def write(self, path, img):
+        """
+        Converting image to 8 bits and saving it to file in background
+        (waits while too many images are not saved yet)
+
+        :param path: Save path
+        :type  path: str
+        :param img:  Image
+        :type  img:  numpy
+        :return:     Future of saving
+        :rtype:      concurrent.futures.Future
+        """
+        if self.ext is not None:
+            path = os.path.splitext(path)[0] + self.ext
+        params = []
+        if self.compression is not None and path.lower().endswith(".png"):
+            params = [cv.IMWRITE_PNG_COMPRESSION, self.compression]
+
+        # Copy of image is made only when there is place for it
+        self._slots.acquire()
+        try:
+            shades = toShades(img)
+            with self._lock:
+                future = self._pool.submit(self._encode, path, shades, params)
+                self._futures[future] = None
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._finished)
+
+        return future
+
+    def _finished(self, future):
+        """
+        Freeing place of saved image, successful write is forgotten
+
+        :param future: Future of saving
+        :type  future: concurrent.futures.Future
+        """
+        if future.exception() is None:
+            with self._lock:
+                self._futures.pop(future, None)
+        self._slots.release()
+
+    @staticmethod
+    def _encode(path, shades, params):
+        """
+        Encoding and saving image
+
+        :param path:   Save path
+        :type  path:   str
+        :param shades: 8-bit image
+        :type  shades: numpy
+        :param params: Parameters of encoder
+        :type  params: list
+        """
+        try:
+            success = cv.imwrite(path, shades, params)
+        except cv.error as e:
+            raise IOError("Can't write image: {}: {}".format(path, e))
+        if not success:
+            raise IOError("Can't write image: {}".format(path))
+
+    def flush(self):
+        """
+        Waiting until all passed images are saved (the first error of saving is raised)
+        """
+        with self._lock:
+            futures, self._futures = list(self._futures), {}
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self):
+        """
+        Saving passed images and stopping threads
+        """
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+import numpy as np
+import time
+from padding import weightedSum
+
+# Costs of convolution methods in seconds per pixel (measured by calibrate()):
+# one pass of shifted slice over image and FFT correlation per log2 of image pixels
+PASS_COST = 0.9e-9
+FFT_COST = 3.0e-9
+
+# Kernels by name (coefficients are multiplied by pixels under them, kernel is not flipped)
+KERNELS = {}
+
+# Divisors of results of kernels by name (normalization of results of smoothing kernels)
+DIVISORS = {}
+
+def register(name, kernel, divisor = 1):
+    """
+    Adding kernel to registry (the same name replaces registered kernel and its divisor).
+    Operator for edge detection is a pair of kernels named "<operator>X" and "<operator>Y"
+
+    :param name:    Name of kernel
+    :type  name:    str
+    :param kernel:  Coefficients with odd amount of rows and columns
+    :type  kernel:  numpy
+    :param divisor: Divisor of result of correlateRegistered()
+    :type  divisor: float
+    :return:        Registered kernel
+    :rtype:         numpy
+    """
+    kernel = np.array(kernel)
+    if kernel.ndim != 2 or kernel.shape[0] % 2 == 0 or kernel.shape[1] % 2 == 0:
+        raise ValueError("Kernel must have odd amount of rows and columns: {}".format(kernel.shape))
+    KERNELS[name] = kernel
+    DIVISORS[name] = divisor
+
+    return kernel
+
+def getKernel(name):
+    """
+    Getting kernel from registry
+
+    :param name: Name of kernel
+    :type  name: str
+    :return:     Coefficients
+    :rtype:      numpy
+    """
+    if name not in KERNELS:
+        raise ValueError("Undefined kernel: {}. Available kernels: {}".format(name, ", ".join(sorted(KERNELS))))
+
+    return KERNELS[name]
+
+def getDivisor(name):
+    """
+    Getting divisor of results of registered kernel
+
+    :param name: Name of kernel
+    :type  name: str
+    :return:     Divisor
+    :rtype:      float
+    """
+    getKernel(name)
+
+    return DIVISORS[name]
+
+def operators():
+    """
+    Getting names of registered operators for edge detection
+
+    :return: Names of operators with both kernels registered
+    :rtype:  list
+    """
+    return sorted(name[:-1] for name in KERNELS if name.endswith("X") and name[:-1] + "Y" in KERNELS)
+
+def kernelTerms(kernel):
+    """
+    Getting nonzero terms of kernel row by row from left to right
+
+    :param kernel: Coefficients
+    :type  kernel: numpy
+    :return:       Weight, row and column of every term
+    :rtype:        list
+    """
+    return [(kernel[row, col], row, col) for row, col in np.ndindex(*kernel.shape) if kernel[row, col] != 0]
+
+def factorize(kernel):
+    """
+    Splitting kernel of rank 1 to column and row kernels (kernel is their outer product).
+    Rank is found with SVD, factors are taken from row and column of the largest coefficient
+    (integer kernels have integer factors)
+
+    :param kernel: Coefficients
+    :type  kernel: numpy
+    :return:       Column and row kernels or None if kernel is not separable
+    :rtype:        numpy, numpy
+    """
+    if not kernel.any() or np.linalg.matrix_rank(kernel.astype(np.float64)) != 1:
+        return None
+
+    row, col = np.unravel_index(np.argmax(np.absolute(kernel)), kernel.shape)
+    if np.issubdtype(kernel.dtype, np.integer):
+        # Column without common divisor divides every column of integer kernel
+        colKernel = kernel[:, col] // np.gcd.reduce(kernel[:, col])
+        rowKernel = kernel[row] // colKernel[row]
+    else:
+        colKernel = kernel[:, col] / kernel[row, col]
+        rowKernel = kernel[row]
+
+    return colKernel[:, None], rowKernel[None, :]
+
+def _termsCost(kernel):
+    """
+    Amount of passes over image done by shifted slice accumulation of kernel
+
+    :param kernel: Coefficients
+    :type  kernel: numpy
+    :rtype:        int
+    """
+    terms = kernelTerms(kernel)
+    # Weighted terms are multiplied and then added, the first one is only copied
+    return sum(1 if abs(weight) == 1 or i == 0 else 2 for i, (weight, _, _) in enumerate(terms))
+
+def _fastLength(n):
+    """
+    Finding the smallest length not less than n with only 2, 3 and 5 as prime factors
+    (FFT of such length is fast)
+
+    :param n: Length
+    :type  n: int
+    :rtype:   int
+    """
+    best = 1 << max(0, int(n - 1).bit_length())
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            length = power35
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power35 *= 3
+        power5 *= 5
+
+    return best
+
+def chooseMethod(kernel, shape):
+    """
+    Choosing the fastest method of correlation with estimated costs
+
+    :param kernel: Coefficients
+    :type  kernel: numpy
+    :param shape:  Shape of expanded image
+    :type  shape:  tuple
+    :return:       "direct", "separable" or "fft"
+    :rtype:        str
+    """
+    pixels = shape[0] * shape[1]
+    costs = {
+        "direct": _termsCost(kernel) * PASS_COST,
+        "fft": np.log2(pixels) * FFT_COST,
+    }
+    factors = factorize(kernel)
+    if factors is not None:
+        # Extra pass writes intermediate image
+        costs["separable"] = (_termsCost(factors[0]) + _termsCost(factors[1]) + 1) * PASS_COST
+
+    return min(costs, key=costs.get)
+
+def correlate(expImg, kernel, out = None, method = "auto", scratch = None, tmp = None):
+    """
+    Correlation of image expanded with border (half of kernel size on every side) with kernel
+    using shifted slice accumulation ("direct"), two passes of separable kernel ("separable")
+    or FFT ("fft", result has small floating point errors)
+
+    :param expImg:  Image with border around it
+    :type  expImg:  numpy
+    :param kernel:  Coefficients
+    :type  kernel:  numpy
+    :param out:     Result array (image size)
+    :type  out:     numpy
+    :param method:  "auto", "direct", "separable" or "fft"
+    :type  method:  str
+    :param scratch: Array of result size for weighted terms of direct method
+    :type  scratch: numpy
+    :param tmp:     Array for result of vertical pass of separable method
+                    (rows of result, columns of expanded image)
+    :type  tmp:     numpy
+    :return:        Result image
+    :rtype:         numpy
+    """
+    height = expImg.shape[0] - kernel.shape[0] + 1
+    width = expImg.shape[1] - kernel.shape[1] + 1
+    if out is None:
+        out = np.empty((height, width), dtype=np.result_type(expImg, kernel))
+    if method == "auto":
+        method = chooseMethod(kernel, expImg.shape)
+
+    if method == "direct":
+        if scratch is None:
+            scratch = np.empty_like(out)
+        terms = kernelTerms(kernel)
+        if terms:
+            weightedSum(expImg, terms, out, scratch)
+        else:
+            out[...] = 0
+    elif method == "separable":
+        factors = factorize(kernel)
+        if factors is None:
+            raise ValueError("Kernel is not separable")
+        # Vertical pass keeps border columns for horizontal one
+        if tmp is None:
+            tmp = np.empty((height, expImg.shape[1]), dtype=out.dtype)
+        correlate(expImg, factors[0], tmp, "direct")
+        correlate(tmp, factors[1], out, "direct", scratch)
+    elif method == "fft":
+        # Circular correlation of fast length wraps only into rows and columns out of result
+        shape = (_fastLength(expImg.shape[0]), _fastLength(expImg.shape[1]))
+        spectrum = np.fft.rfft2(expImg, shape) * np.fft.rfft2(kernel[::-1, ::-1], shape)
+        full = np.fft.irfft2(spectrum, shape)
+        rows = slice(kernel.shape[0] - 1, kernel.shape[0] - 1 + height)
+        cols = slice(kernel.shape[1] - 1, kernel.shape[1] - 1 + width)
+        if np.issubdtype(out.dtype, np.integer):
+            np.rint(full[rows, cols], out=full[rows, cols])
+        out[...] = full[rows, cols]
+    else:
+        raise ValueError('Undefined method: {}. Available methods: "auto", "direct", "separable" or "fft"'.format(method))
+
+    return out
+
+def correlateRegistered(expImg, name, out = None, scratch = None, tmp = None):
+    """
+    Correlation of expanded image with registered kernel, result is divided by divisor of kernel
+
+    :param expImg:  Image with border around it
+    :type  expImg:  numpy
+    :param name:    Name of kernel
+    :type  name:    str
+    :param out:     Result array (image size, float)
+    :type  out:     numpy
+    :param scratch: Array of result size for weighted terms of direct method
+    :type  scratch: numpy
+    :param tmp:     Array for result of vertical pass of separable method
+    :type  tmp:     numpy
+    :return:        Result image
+    :rtype:         numpy
+    """
+    out = correlate(expImg, getKernel(name), out, scratch=scratch, tmp=tmp)
+    if DIVISORS[name] != 1:
+        out /= DIVISORS[name]
+
+    return out
+
+def calibrate(shape = (1080, 1920), repeat = 3):
+    """
+    Measuring costs of shifted slice pass and of FFT correlation on random image
+    and using them for choosing of method
+
+    :param shape:  Shape of image
+    :type  shape:  tuple
+    :param repeat: Amount of timed runs (the fastest one is used)
+    :type  repeat: int
+    :return:       Cost of pass and cost of FFT (seconds per pixel)
+    :rtype:        float, float
+    """
+    global PASS_COST, FFT_COST
+
+    expImg = np.random.RandomState(0).rand(shape[0] + 2, shape[1] + 2)
+    out = np.empty(shape)
+    kernel = np.ones((3, 3))
+    pixels = shape[0] * shape[1]
+
+    def measure(method):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            correlate(expImg, kernel, out, method)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    PASS_COST = measure("direct") / _termsCost(kernel) / pixels
+    FFT_COST = measure("fft") / np.log2(expImg.size) / pixels
+
+    return PASS_COST, FFT_COST
+
+# Operators of edge detection
+register("sobelX", [[1, 0, -1], [2, 0, -2], [1, 0, -1]])
+register("sobelY", [[-1, -2, -1], [0, 0, 0], [1, 2, 1]])
+register("prewittX", [[1, 0, -1], [1, 0, -1], [1, 0, -1]])
+register("prewittY", [[-1, -1, -1], [0, 0, 0], [1, 1, 1]])
+register("robertsX", [[0, 0, 0], [0, 1, 0], [0, 0, -1]])
+register("robertsY", [[0, 0, 0], [0, 0, 1], [0, -1, 0]])
+
+# Smoothing (coefficients without normalization, with divisors of results) and Laplacian
+register("gauss3", [[1, 2, 1], [2, 4, 2], [1, 2, 1]], 16)
+register("gauss5", [[1, 2, 4, 2, 1], [2, 4, 8, 4, 2], [4, 8, 16, 8, 4], [2, 4, 8, 4, 2], [1, 2, 4, 2, 1]], 144)
+register("laplacian", [[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+class PaddedImage:
+    """
+    Image kept inside of persistent allocation with border of nearest pixel values around it,
+    so operators read shifted slices without creating expanded copies of image
+
+    :ivar    buffer: Image with border around it
+    :vartype buffer: numpy
+    :ivar    image:  Image without border (view of buffer)
+    :vartype image:  numpy
+    :ivar    pad:    Width of border
+    :vartype pad:    int
+    """
+    def __init__(self, height, width, pad = 1, dtype = np.float64):
+        self.pad = pad
+        self.buffer = np.empty((height + 2 * pad, width + 2 * pad), dtype=dtype)
+        self.image = self.buffer[pad:-pad, pad:-pad]
+
+    def load(self, img):
+        """
+        Copying image into buffer and filling its border
+
+        :param img: Image
+        :type  img: numpy
+        """
+        self.image[...] = img
+        self.refreshBorder()
+
+    def refreshBorder(self):
+        """
+        Filling border with values of nearest pixels of image
+        """
+        pad = self.pad
+        # Rows above and below image
+        self.buffer[:pad, pad:-pad] = self.image[0]
+        self.buffer[-pad:, pad:-pad] = self.image[-1]
+        # Columns on both sides (with angular pixels)
+        self.buffer[:, :pad] = self.buffer[:, pad:pad + 1]
+        self.buffer[:, -pad:] = self.buffer[:, -pad - 1:-pad]
+
+    def expanded(self, pad = 1):
+        """
+        Getting image with border of given width around it
+
+        :param pad: Width of border (not greater than width of buffer border)
+        :type  pad: int
+        :return:    Image with border (view of buffer)
+        :rtype:     numpy
+        """
+        cut = self.pad - pad
+        return self.buffer[cut:self.buffer.shape[0] - cut, cut:self.buffer.shape[1] - cut]
+
+def weightedSum(expImg, terms, out, scratch):
+    """
+    Accumulating weighted shifted slices of expanded image in the given order
+    without temporary arrays (the same order as sum written with "+" gives)
+
+    :param expImg:  Image with border around it
+    :type  expImg:  numpy
+    :param terms:   Weight, row and column of slice start in expanded image for every term
+    :type  terms:   list
+    :param out:     Result array
+    :type  out:     numpy
+    :param scratch: Array of result size for weighted terms
+    :type  scratch: numpy
+    :return:        out
+    :rtype:         numpy
+    """
+    height, width = out.shape
+    for i, (weight, row, col) in enumerate(terms):
+        part = expImg[row:row + height, col:col + width]
+        if i == 0:
+            if weight == 1:
+                out[...] = part
+            elif weight == -1:
+                np.negative(part, out=out)
+            else:
+                np.multiply(part, weight, out=out)
+        elif weight == 1:
+            out += part
+        elif weight == -1:
+            out -= part
+        else:
+            np.multiply(part, weight, out=scratch)
+            out += scratch
+
+    return out
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+import os, sys
+
+# Modules shared by labs are in common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common"))
+
+from concurrent.futures import ProcessPoolExecutor
+from imagewriter import ImageWriter
+from main import processImage
+import argparse, glob, multiprocessing, multiprocessing.util, queue, threading, time
+
+# Extensions of images collected from directories
+EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff")
+
+def collectImages(sources):
+	"""
+	Collecting images from directories, glob patterns and file paths
+
+	:param sources: Directories, glob patterns or file paths
+	:type  sources: list
+	:return:        Pairs of image path and its output subdirectory (named with extension,
+	                so "a.jpg" and "a.png" have their own subdirectories)
+	:rtype:         list
+	"""
+	images = []
+	# Resolved paths of collected images and taken output subdirectories
+	seen = set()
+	taken = set()
+	def add(index, path, subdir):
+		real = os.path.realpath(path)
+		if real in seen:
+			return
+		seen.add(real)
+		# Image with the same name in other source gets index of its source (and counter
+		# if it is taken too), so images never overwrite each other's results
+		unique, count = subdir, 1
+		while os.path.normcase(os.path.normpath(unique)) in taken:
+			unique = "{}_{}".format(subdir, index + 1) if count == 1 else "{}_{}_{}".format(subdir, index + 1, count)
+			count += 1
+		taken.add(os.path.normcase(os.path.normpath(unique)))
+		images.append((path, unique))
+
+	for index, source in enumerate(sources):
+		if os.path.isdir(source):
+			# Keep directory structure in output tree
+			for root, _, files in sorted(os.walk(source)):
+				for name in sorted(files):
+					if name.lower().endswith(EXTENSIONS):
+						path = os.path.join(root, name)
+						add(index, path, os.path.relpath(path, source))
+		else:
+			paths = sorted(glob.glob(source)) if glob.has_magic(source) else [source]
+			for path in paths:
+				add(index, path, os.path.basename(path))
+
+	return images
+
+class ImageWrites:
+	"""
+	Writer of one image in worker process. Saving of its files is followed, so image is
+	reported to parent process when all of them are saved (with the first error of
+	processing or saving)
+
+	:ivar    writer:  Writer of worker process
+	:vartype writer:  ImageWriter
+	:ivar    path:    Path to source image
+	:vartype path:    str
+	:ivar    results: Queue of results of images (path, seconds, error message or None)
+	:vartype results: multiprocessing.Queue
+	"""
+	def __init__(self, writer, path, results):
+		self.writer = writer
+		self.path = path
+		self.results = results
+		self._start = time.perf_counter()
+		self._futures = []
+
+	def write(self, path, img):
+		"""
+		Saving file of image in background
+
+		:param path: Save path
+		:type  path: str
+		:param img:  Image
+		:type  img:  numpy
+		:return:     Future of saving
+		:rtype:      concurrent.futures.Future
+		"""
+		future = self.writer.write(path, img)
+		self._futures.append(future)
+
+		return future
+
+	def finish(self, error=None):
+		"""
+		Reporting image when all its files are saved
+
+		:param error: Error of processing
+		:type  error: Exception
+		"""
+		futures = list(self._futures)
+		lock = threading.Lock()
+		left = [len(futures)]
+
+		def report():
+			errors = [error] + [future.exception() for future in futures]
+			error_ = next((e for e in errors if e is not None), None)
+			self.results.put((self.path, time.perf_counter() - self._start,
+				None if error_ is None else str(error_)))
+
+		def done(future):
+			with lock:
+				left[0] -= 1
+				last = left[0] == 0
+			if last: report()
+
+		if not futures:
+			report()
+		for future in futures:
+			future.add_done_callback(done)
+
+# Writer of worker process and queue of results of images (set by initWorker)
+_writer = None
+_results = None
+
+def initWorker(results):
+	"""
+	Creating writer of worker process, it encodes images while next ones are processed.
+	Writer is closed when worker process exits
+
+	:param results: Queue of results of images
+	:type  results: multiprocessing.Queue
+	"""
+	global _writer, _results
+	_writer = ImageWriter()
+	_results = results
+	multiprocessing.util.Finalize(_writer, closeWriter, exitpriority=10)
+
+def closeWriter():
+	"""
+	Saving remaining images and stopping writer of worker process (errors of saving are
+	already reported with their images)
+	"""
+	try:
+		_writer.close()
+	except Exception:
+		pass
+
+def runImage(path, dirname):
+	"""
+	Processing one image in worker process. Its files are saved in background, result
+	of image is reported to queue of results when all of them are saved
+
+	:param path:    Path to source image
+	:type  path:    str
+	:param dirname: Output directory of image
+	:type  dirname: str
+	"""
+	writes = ImageWrites(_writer, path, _results)
+	try:
+		processImage(path, dirname, writes)
+	except Exception as e:
+		writes.finish(e)
+	else:
+		writes.finish()
+
+def runBatch(images, outDir, workers=None):
+	"""
+	Processing images on process pool and reporting each of them when all its files are saved
+
+	:param images:  Pairs of image path and its output subdirectory
+	:type  images:  list
+	:param outDir:  Root of output tree
+	:type  outDir:  str
+	:param workers: Number of worker processes (number of CPUs by default)
+	:type  workers: int
+	:return:        Number of failed images
+	:rtype:         int
+	"""
+	failed = 0
+	start = time.perf_counter()
+	workers = workers or os.cpu_count()
+	results = multiprocessing.Queue()
+	with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(results,)) as pool:
+		futures = {pool.submit(runImage, path, os.path.join(outDir, subdir)): path
+			for path, subdir in images}
+
+		# Report images in order of completion
+		reported = set()
+		while len(reported) < len(images):
+			try:
+				path, seconds, error = results.get(timeout=0.1)
+			except queue.Empty:
+				# Images which are never reported because their task failed
+				lost = [(futures[future], future.exception()) for future in futures
+					if future.done() and future.exception() is not None and futures[future] not in reported]
+				for path, error in lost:
+					reported.add(path)
+					failed += 1
+					print("[fail]            {}: {}".format(path, error), file=sys.stderr, flush=True)
+				continue
+			reported.add(path)
+			if error is None:
+				print("[ok]   {:8.3f}s  {}".format(seconds, path), flush=True)
+			else:
+				failed += 1
+				print("[fail]            {}: {}".format(path, error), file=sys.stderr, flush=True)
+
+	print("Processed {} images ({} failed) in {:.3f}s".format(
+		len(images), failed, time.perf_counter() - start))
+
+	return failed
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Linear stretching and histogram equalization of many images")
+	parser.add_argument("sources", nargs="+", help="directories, glob patterns or image files")
+	parser.add_argument("-o", "--out", default="out", help="root of output tree")
+	parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+	args = parser.parse_args()
+
+	images = collectImages(args.sources)
+	sys.exit(1 if runBatch(images, args.out, args.workers) else 0)
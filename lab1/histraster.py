@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import numpy as np
+
+# Colors of histogram image (BGR)
+BACKGROUND = (255, 255, 255)
+FOREGROUND = (0, 0, 0)
+BAR        = (180, 119, 31)
+
+# Font of labels
+FONT = cv.FONT_HERSHEY_SIMPLEX
+
+def renderHistogram(shadeMap, title = "", width = 1280, height = 720):
+    """
+    Drawing histogram bars straight into image
+
+    :param shadeMap: Map with the amount of each shade
+    :type  shadeMap: numpy
+    :param title:    Title of histogram
+    :type  title:    str
+    :param width:    Width of image
+    :type  width:    int
+    :param height:   Height of image
+    :type  height:   int
+    :return:         Histogram image (BGR)
+    :rtype:          numpy
+    """
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[...] = BACKGROUND
+
+    # Plot area
+    left, right, top, bottom = 90, width - 40, 60, height - 50
+    plotWidth, plotHeight = right - left, bottom - top
+
+    # Shade of every column of plot area (x axis shows shades -1 - 256)
+    shades = np.floor((np.arange(plotWidth) + 0.5) * 258 / plotWidth).astype(int) - 1
+    inside = (shades >= 0) & (shades < 256)
+
+    # Top of bar in every column
+    counts = np.asarray(shadeMap, dtype=np.float64)
+    peak = max(counts.max(), 1)
+    barTop = plotHeight - np.rint(counts / peak * plotHeight)
+    columnTop = np.where(inside, barTop[np.clip(shades, 0, 255)], plotHeight)
+
+    # Fill bars
+    bars = np.arange(plotHeight)[:,None] >= columnTop[None,:]
+    img[top:bottom, left:right][bars] = BAR
+
+    # Axes with ticks
+    cv.rectangle(img, (left, top), (right, bottom), FOREGROUND, 1)
+    for shade in range(0, 256, 50):
+        x = left + int(round((shade + 1.5) * plotWidth / 258))
+        cv.line(img, (x, bottom), (x, bottom + 5), FOREGROUND, 1)
+        _putText(img, str(shade), (x, bottom + 25), 0.5)
+    for count in (0, peak / 2, peak):
+        y = bottom - int(round(count / peak * plotHeight))
+        cv.line(img, (left - 5, y), (left, y), FOREGROUND, 1)
+        _putText(img, "{:.0f}".format(count), (left - 8, y + 5), 0.5, "right")
+
+    # Title
+    _putText(img, title, (width // 2, top - 20), 0.8)
+
+    return img
+
+def _putText(img, text, point, scale, align = "center"):
+    """
+    Drawing text with baseline at point
+
+    :param img:   Image
+    :type  img:   numpy
+    :param text:  Text
+    :type  text:  str
+    :param point: Point of text baseline (x, y)
+    :type  point: tuple
+    :param scale: Font scale
+    :type  scale: float
+    :param align: Which point of baseline is given ("center" or "right")
+    :type  align: str
+    """
+    (textWidth, _), _ = cv.getTextSize(text, FONT, scale, 1)
+    x = point[0] - (textWidth // 2 if align == "center" else textWidth)
+    cv.putText(img, text, (x, point[1]), FONT, scale, FOREGROUND, 1, cv.LINE_AA)
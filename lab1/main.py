@@ -1,40 +1,66 @@
 #!/usr/bin/env python
 
-from shadefix import ShadeFix
 import os, sys
 
-# Create output directory
-dirname = "out"
-if not os.path.exists(dirname): os.mkdir(dirname)
+# Modules shared by labs are in common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common"))
+
+from imagewriter import ImageWriter
+from shadefix import ShadeFix
+
+def processImage(path, dirname, writer=None):
+	"""
+	Saving greyscale, stretched and equalized images with their histograms
+
+	:param path:    Path to source image
+	:type  path:    str
+	:param dirname: Output directory
+	:type  dirname: str
+	:param writer:  Writer saving images in background (images are saved before return by default)
+	:type  writer:  ImageWriter
+	"""
+	# Images are encoded while next ones are processed
+	ownWriter = writer is None
+	if ownWriter: writer = ImageWriter()
+
+	# Load image (output directory is created only for readable image)
+	img = ShadeFix(path)
+	os.makedirs(dirname, exist_ok=True)
+
+	imgName  = [os.path.join(dirname, "grey{}.png".format(i + 1)) for i in range(3)]
+	histName = [os.path.join(dirname, "hist{}.png".format(i + 1)) for i in range(4)]
+
+	# Save greyscale image
+	img.saveImage(imgName[0], writer)
 
-# Load image
-if len(sys.argv) > 1:
-	img = ShadeFix(sys.argv[1])
-else:
-	img = ShadeFix("test.jpg")
+	# Save greyscale image histogram
+	img.makeHistogram("Histogram from greyscale image", histName[0], writer=writer)
 
-imgName  = [dirname + "/grey{}.png".format(i + 1) for i in range(3)]
-histName = [dirname + "/hist{}.png".format(i + 1) for i in range(4)]
+	# Save normalized histogram
+	img.normalizeShadeMap()
+	img.makeHistogram("Histogram after cutting range", histName[1], writer=writer)
 
-# Save greyscale image
-img.saveImage(imgName[0])
+	# Save image and histogram after linear stretching
+	img.linearStretching()
+	img.saveImage(imgName[1], writer)
+	img.makeHistogram("Histogram after linear stretching", histName[2], writer=writer)
 
-# Save greyscale image histogram
-img.makeHistogram("Histogram from greyscale image", histName[0])
+	# Restore original greyscale image
+	img.restoreImage()
 
-# Save normalized histogram
-img.normalizeShadeMap()
-img.makeHistogram("Histogram after cutting range", histName[1])
+	# Save image and histogram after histogram equalization
+	img.histogramEqualization()
+	img.saveImage(imgName[2], writer)
+	img.makeHistogram("Histogram after equalization", histName[3], writer=writer)
 
-# Save image and histogram after linear stretching
-img.linearStretching()
-img.saveImage(imgName[1])
-img.makeHistogram("Histogram after linear stretching", histName[2])
+	if ownWriter: writer.close()
 
-# Restore original greyscale image
-img.restoreImage()
+if __name__ == "__main__":
+	# Create output directory
+	dirname = "out"
+	if not os.path.exists(dirname): os.mkdir(dirname)
 
-# Save image and histogram after histogram equalization
-img.histogramEqualization()
-img.saveImage(imgName[2])
-img.makeHistogram("Histogram after equalization", histName[3])
\ No newline at end of file
+	if len(sys.argv) > 1:
+		processImage(sys.argv[1], dirname)
+	else:
+		processImage("test.jpg", dirname)
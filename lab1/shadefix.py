@@ -1,133 +1,382 @@
 #!/usr/bin/env python
 
+import cache
 import cv2 as cv
+import greyscale
 import numpy as np
-from matplotlib import pyplot as plt
+from histraster import renderHistogram
+from shadehistogram import ShadeHistogram
 
 class ShadeFix:
     """
     Class for performing linear stretching and histogram equalization on greyscale image
 
-    :ivar    inImg:    Loaded image, converted to greyscale
-    :vartype inImg:    numpy
-    :ivar    height:   Height of image
-    :vartype height:   int
-    :ivar    width:    Width of image
-    :vartype width:    int
-    :ivar    origImg:  Backup of original greyscale image
-    :vartype origImg:  numpy
-    :ivar    shadeMap: Map with the amount of each shade
-    :vartype shadeMap: numpy
+    :ivar    inImg:         Loaded image, converted to greyscale
+    :vartype inImg:         numpy
+    :ivar    height:        Height of image
+    :vartype height:        int
+    :ivar    width:         Width of image
+    :vartype width:         int
+    :ivar    origImg:       Backup of original greyscale image
+    :vartype origImg:       numpy
+    :ivar    histogram:     Histogram of image
+    :vartype histogram:     ShadeHistogram
+    :ivar    origHistogram: Backup of original image histogram
+    :vartype origHistogram: ShadeHistogram
     """
     def __init__(self, inImg):
-        # Load image
-        self.inImg = cv.imread(inImg)
+        # Load image (or use already loaded one) and convert it to greyscale
+        # (greyscale image of file can come from cache)
+        self.inImg = cache.loadGreyscale(inImg)
+        if self.inImg is None:
+            raise IOError("Can't read image: {}".format(inImg))
         # Rows
         self.height = self.inImg.shape[0]
         # Columns
         self.width = self.inImg.shape[1]
-        # RGB to Greyscale image
-        if len(self.inImg.shape) == 3: self.toGreyscale()
         # Greyscale image backup
         self.origImg = self.inImg
-        # Shade Map
-        self.shadeMap = self.getShadeMap()
+        # Key of current image in cache
+        self._key, self._keyImg = cache.imageKey(self.origImg), self.inImg
+        # Histogram and its backup
+        self.histogram = ShadeHistogram(self.getShadeMap())
+        self.origHistogram = self.histogram
+
+    @property
+    def shadeMap(self):
+        """
+        Map with the amount of each shade inside of histogram range
+
+        :rtype: numpy
+        """
+        return self.histogram.shades
+
+    @shadeMap.setter
+    def shadeMap(self, shadeMap):
+        self.histogram = ShadeHistogram(shadeMap)
 
     def toGreyscale(self):
         """
         Converting RGB image to greyscale
         """
-        # Get color arrays
-        red   = self.inImg[...,2]
-        green = self.inImg[...,1]
-        blue  = self.inImg[...,0]
-        
-        # Fill array with shades of grey
-        outImg = np.zeros((self.height, self.width))
-        outImg[...] = 0.299 * red + 0.587 * green + 0.114 * blue
-        
-        # Round result shades
-        outImg = np.round(outImg)
-        
-        # Update image
-        self.inImg = outImg 
+        self.inImg = greyscale.toGreyscale(self.inImg)
 
     def linearStretching(self):
         """
         Performing linear stretching on greyscale image
         """
-        # Get bounds of histogram
-        a = np.nonzero(self.shadeMap)[0][0]
-        b = np.nonzero(self.shadeMap)[0][-1]
+        # Replace pixels according to stretched shades
+        lut = self.stretchingLUT(self.histogram.lower, self.histogram.upper)
+        self._applyLUT(lut)
+
+        # Update histogram without touching pixels
+        self.histogram = self.histogram.remap(lut)
+
+    @staticmethod
+    def stretchingLUT(a, b):
+        """
+        Creating shades replace map for linear stretching
+
+        :param a: First shade of histogram range
+        :type  a: int
+        :param b: Last shade of histogram range
+        :type  b: int
+        :return:  Lookup table with new value of each shade (shades are not changed
+                  if range has one shade)
+        :rtype:   numpy
+        """
+        # Range of one shade (e.g. black image) can't be stretched
+        if b <= a:
+            return np.arange(256, dtype=np.uint8)
 
         # Linear stretching
-        resImg = np.zeros((self.height, self.width))
-        resImg[...] = (self.inImg[...] - a) * (255 / (b - a))
+        shades = (np.arange(256) - a) * (255 / (b - a))
 
         # Fix out of range values
-        resImg[resImg < 0] = 0
-        resImg[resImg > 255] = 255
-        resImg = np.round(resImg)
+        return np.round(np.clip(shades, 0, 255)).astype(np.uint8)
 
-        # Update image and shade map
-        self.inImg = resImg
-        self.shadeMap = self.getShadeMap()
-
-    def histogramEqualization(self):
+    def histogramEqualization(self, shadeMap = None):
         """
         Performing histogram equalization on greyscale image
+
+        :param shadeMap: Precomputed map with the amount of each shade
+                         (shade map of current image by default)
+        :type  shadeMap: numpy
+        """
+        if shadeMap is None:
+            shadeMap = self.shadeMap
+
+        # Replace pixels according to shades replace map
+        lut = self.equalizationLUT(shadeMap)
+        self._applyLUT(lut)
+
+        # Update histogram without touching pixels
+        self.histogram = self.histogram.remap(lut)
+
+    @staticmethod
+    def equalizationLUT(shadeMap):
         """
-        # Create shades replace map and fill it
+        Creating shades replace map for histogram equalization
+
+        :param shadeMap: Map with the amount of each shade
+        :type  shadeMap: numpy
+        :return:         Lookup table with new value of each shade
+        :rtype:          numpy
+        """
+        # Amount of pixels darker than each shade
+        cdf = np.cumsum(shadeMap, dtype=np.float64)
         shades = np.zeros(256)
-        pixelCount = self.height * self.width
-        for k in range(0, shades.size - 1):
-            shades[k] = np.sum(self.shadeMap[0:k]) / pixelCount
+        shades[1:] = cdf[:-1]
 
         # Histogram stretching for the whole range
-        shades[...] *= 255
+        shades *= 255 / cdf[-1]
+
+        return np.round(shades).astype(np.uint8)
 
-        # Replace pixels according to shade map
-        resImg = np.zeros((self.height, self.width))
-        resImg[...] = shades[self.inImg[...].astype(int)]
+    def histogramMatching(self, reference):
+        """
+        Replacing shades of greyscale image so that its histogram matches reference histogram
+
+        :param reference: Reference histogram, map with the amount of each shade or
+                          path to histogram cache file (see ShadeHistogram.save)
+        :type  reference: ShadeHistogram, numpy or str
+        """
+        if isinstance(reference, str):
+            reference = ShadeHistogram.load(reference)
+        elif not isinstance(reference, ShadeHistogram):
+            reference = ShadeHistogram(reference)
+
+        # Replace pixels according to shades replace map
+        lut = self.matchingLUT(self.shadeMap, reference.cdf)
+        self._applyLUT(lut)
+
+        # Update histogram without touching pixels
+        self.histogram = self.histogram.remap(lut)
+
+    @staticmethod
+    def matchingLUT(shadeMap, referenceCdf):
+        """
+        Creating shades replace map for histogram matching: every shade is replaced
+        with the first reference shade with at least the same fraction of darker pixels
+
+        :param shadeMap:     Map with the amount of each shade
+        :type  shadeMap:     numpy
+        :param referenceCdf: Cumulative amount of pixels up to each shade of reference
+        :type  referenceCdf: numpy
+        :return:             Lookup table with new value of each shade
+        :rtype:              numpy
+        """
+        cdf = np.cumsum(shadeMap, dtype=np.float64)
+        shades = np.searchsorted(referenceCdf / referenceCdf[-1], cdf / cdf[-1], "left")
+
+        return np.minimum(shades, 255).astype(np.uint8)
+
+    @cache.keyedStep
+    def _applyLUT(self, lut):
+        """
+        Replacing every shade of image with its value from lookup table
+
+        :param lut: Lookup table with 256 shades
+        :type  lut: numpy
+        """
+        self.inImg = np.take(lut, self.inImg.astype(np.uint8, copy=False))
+
+    @cache.cachedStep
+    def adaptiveEqualization(self, tiles = (8, 8), clipLimit = 2.0):
+        """
+        Performing contrast limited adaptive histogram equalization on greyscale image
+
+        :param tiles:     Amount of tiles in rows and columns
+        :type  tiles:     tuple
+        :param clipLimit: Maximum amount of pixels in each shade of tile relative to
+                          its mean amount (no clipping if less than 1)
+        :type  clipLimit: float
+        """
+        img = self.inImg.astype(np.uint8, copy=False)
+        rows = slice(0, self.height)
+        grid = self._tileGrid(tiles)
+
+        # Equalization replace map of every tile
+        luts = self._tileLUTs(self._tileShadeMaps(img, rows, grid), clipLimit)
 
         # Update image and shade map
-        self.inImg = resImg
-        self.shadeMap = self.getShadeMap()
+        self.inImg = np.empty((self.height, self.width), dtype=np.uint8)
+        self._interpolateTiles(img, rows, grid, luts, self.inImg)
+        self.histogram = ShadeHistogram(self.getShadeMap())
 
-    def makeHistogram(self, title, path):
+    def _tileGrid(self, tiles):
+        """
+        Dividing image to tiles of adaptive equalization
+
+        :param tiles: Amount of tiles in rows and columns
+        :type  tiles: tuple
+        :return:      Tile of every row and column of image, amount of tiles in rows and columns
+        :rtype:       numpy, numpy, int, int
+        """
+        tileRows = min(tiles[0], self.height)
+        tileCols = min(tiles[1], self.width)
+
+        # Tile of every row and column of image
+        rowTile = (np.arange(self.height) * tileRows // self.height).astype(np.int32)
+        colTile = (np.arange(self.width) * tileCols // self.width).astype(np.int32)
+
+        return rowTile, colTile, tileRows, tileCols
+
+    @staticmethod
+    def _tileShadeMaps(img, rows, grid):
+        """
+        Creating shade maps of all tiles in one pass over image rows
+
+        :param img:  Greyscale image rows (uint8)
+        :type  img:  numpy
+        :param rows: Rows of image
+        :type  rows: slice
+        :param grid: Tiles of image (from _tileGrid())
+        :type  grid: tuple
+        :return:     Shade map of every tile (in rows of array)
+        :rtype:      numpy
+        """
+        rowTile, colTile, tileRows, tileCols = grid
+        index = (rowTile[rows] * tileCols * 256)[:,None] + (colTile * 256)[None,:] + img
+
+        return np.bincount(index.ravel(), minlength=tileRows * tileCols * 256).reshape(-1, 256)
+
+    @staticmethod
+    def _tileLUTs(shadeMaps, clipLimit):
+        """
+        Creating equalization replace maps of tiles from their clipped shade maps
+
+        :param shadeMaps: Shade map of every tile
+        :type  shadeMaps: numpy
+        :param clipLimit: Maximum amount of pixels in each shade of tile relative to
+                          its mean amount (no clipping if less than 1)
+        :type  clipLimit: float
+        :return:          Replace map of every tile
+        :rtype:           numpy
+        """
+        # Clip shade maps and spread clipped pixels over all shades
+        if clipLimit >= 1:
+            limit = clipLimit * shadeMaps.sum(axis=1, keepdims=True) / 256
+            excess = np.maximum(shadeMaps - limit, 0).sum(axis=1, keepdims=True)
+            shadeMaps = np.minimum(shadeMaps, limit) + excess / 256
+
+        cdf = np.cumsum(shadeMaps, axis=1)
+        luts = np.zeros(shadeMaps.shape, dtype=np.float32)
+        luts[:,1:] = cdf[:,:-1] * (255 / cdf[:,-1:])
+
+        return luts
+
+    def _interpolateTiles(self, img, rows, grid, luts, out):
+        """
+        Replacing shades of image rows with values interpolated from replace maps
+        of four nearest tiles
+
+        :param img:  Greyscale image rows (uint8)
+        :type  img:  numpy
+        :param rows: Rows of image
+        :type  rows: slice
+        :param grid: Tiles of image (from _tileGrid())
+        :type  grid: tuple
+        :param luts: Replace map of every tile
+        :type  luts: numpy
+        :param out:  Result rows (uint8, it can be img)
+        :type  out:  numpy
+        """
+        rowTile, colTile, tileRows, tileCols = grid
+
+        # Blend replace maps of two nearest tile rows for every image row
+        first, second, weight = (part[rows] for part in self._tileWeights(rowTile, tileRows))
+        luts = luts.reshape(tileRows, -1)
+        rowLuts = luts[first]
+        rowLuts += weight[:,None] * (luts[second] - rowLuts)
+
+        # Interpolate shades from blended replace maps of two nearest tile columns
+        cols = self._tileWeights(colTile, tileCols)
+        rowBase = np.arange(len(first), dtype=np.int32) * (tileCols * 256)
+        left  = np.take(rowLuts, rowBase[:,None] + (cols[0] * 256)[None,:] + img)
+        right = np.take(rowLuts, rowBase[:,None] + (cols[1] * 256)[None,:] + img)
+        left += cols[2] * (right - left)
+
+        np.rint(left, out=out, casting="unsafe")
+
+    def _loadCached(self, img):
+        """
+        Making cached result of operation current image
+
+        :param img: Result image
+        :type  img: numpy
+        """
+        self.inImg = np.array(img)
+        self.histogram = ShadeHistogram(self.getShadeMap())
+
+    @staticmethod
+    def _tileWeights(tileOf, count):
+        """
+        Finding two nearest tile centers and interpolation weight for every row (column)
+
+        :param tileOf: Tile of every row (column)
+        :type  tileOf: numpy
+        :param count:  Amount of tiles
+        :type  count:  int
+        :return:       First and second tile, weight of second tile
+        :rtype:        numpy, numpy, numpy
+        """
+        # Centers of tiles
+        tile = np.arange(count)
+        centers = (np.searchsorted(tileOf, tile) + np.searchsorted(tileOf, tile, "right") - 1) / 2
+
+        # Nearest centers on both sides (the same one near borders)
+        pos = np.arange(tileOf.size)
+        first = np.clip(np.searchsorted(centers, pos, "right") - 1, 0, count - 1).astype(np.int32)
+        second = np.minimum(first + 1, count - 1).astype(np.int32)
+        span = centers[second] - centers[first]
+        weight = np.clip((pos - centers[first]) / np.where(span > 0, span, 1), 0, 1)
+
+        return first, second, weight.astype(np.float32)
+
+    def makeHistogram(self, title, path, backend = "raster", writer = None):
         """
         Creating histogram of image and save to file
 
-        :param title: Title of histogram
-        :type  title: str
-        :param path:  Save path
-        :type  path:  str
+        :param title:   Title of histogram
+        :type  title:   str
+        :param path:    Save path
+        :type  path:    str
+        :param backend: Drawing backend ("raster" or "matplotlib")
+        :type  backend: str
+        :param writer:  Writer saving raster histogram in background (it is saved at once by default)
+        :type  writer:  ImageWriter
         """
+        if backend == "raster":
+            if writer is not None:
+                writer.write(path, renderHistogram(self.shadeMap, title))
+            else:
+                cv.imwrite(path, renderHistogram(self.shadeMap, title))
+            return
+        if backend != "matplotlib":
+            raise ValueError('Undefined backend: {}. Available backends: "raster" or "matplotlib"'.format(backend))
+
+        # Matplotlib is loaded only when it is used
+        from matplotlib import pyplot as plt
+
         # Create plot
         fig = plt.figure(figsize=(12.80, 7.20), dpi=100)
         plt.bar(np.arange(256), self.shadeMap, 1)
         plt.xlim(-1, 256)
         plt.title(title)
-        
+
         # Save plot
         fig.savefig(path)
+        plt.close(fig)
 
-    def normalizeShadeMap(self):
+    def normalizeShadeMap(self, fraction = 0.05):
         """
-        Deleting about 5% of histogram pixels from corners
+        Cutting histogram range to leave out about 5% of pixels on its corners
+
+        :param fraction: Fraction of pixels to leave out
+        :type  fraction: float
         """
-        check, a, b = 0, 0, 255
-        while check < 0.05 * self.width * self.height:
-            # Cut from left side
-            if self.shadeMap[a] <= self.shadeMap[b]:
-                check += self.shadeMap[a]
-                self.shadeMap[a] = 0
-                a += 1
-            # Cut from right side
-            else:
-                check += self.shadeMap[b]
-                self.shadeMap[b] = 0
-                b -=1
+        self.histogram = self.histogram.clip(fraction)
 
     def getShadeMap(self):
         """
@@ -136,20 +385,26 @@ class ShadeFix:
         :return: Shade map
         :rtype:  numpy
         """
-        return np.bincount(self.inImg.astype(int).flat, minlength=256)
+        return np.bincount(self.inImg.astype(np.uint8, copy=False).ravel(), minlength=256)
 
-    def saveImage(self, path):
+    def saveImage(self, path, writer = None):
         """
         Saving image to file
 
-        :param path: Save path
-        :type  path: str
+        :param path:   Save path
+        :type  path:   str
+        :param writer: Writer saving image in background (image is saved at once by default)
+        :type  writer: ImageWriter
         """
-        cv.imwrite(path, self.inImg)
+        if writer is not None:
+            writer.write(path, self.inImg)
+        else:
+            cv.imwrite(path, self.inImg)
 
     def restoreImage(self):
         """
         Restoring original greyscale image and shade map from backup
         """
         self.inImg = self.origImg
-        self.shadeMap = self.getShadeMap()
\ No newline at end of file
+        self.histogram = self.origHistogram
+        self._key, self._keyImg = cache.imageKey(self.origImg), self.inImg
\ No newline at end of file
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+class ShadeHistogram:
+    """
+    Map with the amount of each shade of greyscale image and its statistics.
+    Cumulative map is computed once, so all queries use only 256 shades
+
+    :ivar    counts: Amount of each shade in image
+    :vartype counts: numpy
+    :ivar    lower:  First shade of range
+    :vartype lower:  int
+    :ivar    upper:  Last shade of range
+    :vartype upper:  int
+    """
+    def __init__(self, counts, lower = None, upper = None):
+        self.counts = np.asarray(counts)
+        self._cdf = None
+        # Range of shades (from first to last present shade by default)
+        self.lower = int(np.searchsorted(self.cdf, 0, "right")) if lower is None else lower
+        self.upper = int(np.searchsorted(self.cdf, self.total, "left")) if upper is None else upper
+
+    @classmethod
+    def fromImage(cls, img):
+        """
+        Creating histogram of greyscale image
+
+        :param img: Greyscale image
+        :type  img: numpy
+        :return:    Histogram
+        :rtype:     ShadeHistogram
+        """
+        return cls(np.bincount(img.astype(np.uint8, copy=False).ravel(), minlength=256))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loading histogram from cache file
+
+        :param path: Path to ".npy" file
+        :type  path: str
+        :return:     Histogram
+        :rtype:      ShadeHistogram
+        """
+        return cls(np.load(path))
+
+    def save(self, path):
+        """
+        Saving amount of each shade to cache file
+
+        :param path: Path to ".npy" file
+        :type  path: str
+        """
+        np.save(path, self.counts)
+
+    @property
+    def cdf(self):
+        """
+        Cumulative amount of pixels up to each shade
+
+        :rtype: numpy
+        """
+        if self._cdf is None:
+            self._cdf = np.cumsum(self.counts)
+        return self._cdf
+
+    @property
+    def total(self):
+        """
+        Amount of pixels
+
+        :rtype: int
+        """
+        return self.cdf[-1]
+
+    @property
+    def shades(self):
+        """
+        Amount of each shade inside of range (shades out of range are zero)
+
+        :rtype: numpy
+        """
+        shades = np.zeros_like(self.counts)
+        shades[self.lower:self.upper + 1] = self.counts[self.lower:self.upper + 1]
+        return shades
+
+    def mean(self):
+        """
+        Mean shade of image
+
+        :rtype: float
+        """
+        return np.dot(np.arange(256), self.counts) / self.total
+
+    def variance(self):
+        """
+        Variance of shades of image
+
+        :rtype: float
+        """
+        return np.dot((np.arange(256) - self.mean()) ** 2, self.counts) / self.total
+
+    def percentile(self, q):
+        """
+        Finding the lowest shade with at least q percent of pixels not brighter than it
+
+        :param q: Percent of pixels (0 - 100)
+        :type  q: float
+        :return:  Shade
+        :rtype:   int
+        """
+        return int(np.searchsorted(self.cdf, q / 100 * self.total, "left"))
+
+    def clip(self, fraction):
+        """
+        Cutting range so that about fraction of pixels inside of range is left out
+        (half of it on both sides)
+
+        :param fraction: Fraction of pixels to cut
+        :type  fraction: float
+        :return:         Histogram with the same shades and cut range
+        :rtype:          ShadeHistogram
+        """
+        first = self.cdf[self.lower - 1] if self.lower > 0 else 0
+        last = self.cdf[self.upper]
+        cut = fraction * (last - first) / 2
+
+        lower = int(np.searchsorted(self.cdf, first + cut, "right"))
+        upper = int(np.searchsorted(self.cdf, last - cut, "left"))
+
+        return ShadeHistogram(self.counts, min(lower, upper), max(lower, upper))
+
+    def remap(self, lut):
+        """
+        Creating histogram of image after replacing its shades with lookup table,
+        pixels are not touched
+
+        :param lut: Lookup table with 256 shades
+        :type  lut: numpy
+        :return:    Histogram of result image
+        :rtype:     ShadeHistogram
+        """
+        counts = np.bincount(lut, weights=self.counts, minlength=256)
+        if np.issubdtype(self.counts.dtype, np.integer):
+            counts = np.rint(counts).astype(self.counts.dtype)
+
+        return ShadeHistogram(counts)
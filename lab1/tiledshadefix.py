@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import greyscale
+import numpy as np
+from shadefix import ShadeFix
+from shadehistogram import ShadeHistogram
+
+class TiledShadeFix(ShadeFix):
+    """
+    Class for performing linear stretching and histogram equalization on greyscale image
+    which does not fit in memory. Image is read through memory map and processed by tiles
+    of whole rows, so peak memory depends on tile size only
+
+    :ivar    inImg:         Memory-mapped current image (RGB or greyscale)
+    :vartype inImg:         numpy
+    :ivar    height:        Height of image
+    :vartype height:        int
+    :ivar    width:         Width of image
+    :vartype width:         int
+    :ivar    origImg:       Memory-mapped original image
+    :vartype origImg:       numpy
+    :ivar    outImg:        Memory-mapped greyscale result image
+    :vartype outImg:        numpy
+    :ivar    tileRows:      Amount of image rows in one tile
+    :vartype tileRows:      int
+    :ivar    histogram:     Histogram of image
+    :vartype histogram:     ShadeHistogram
+    :ivar    origHistogram: Backup of original image histogram
+    :vartype origHistogram: ShadeHistogram
+    """
+    def __init__(self, inImg, outImg, shape = None, dtype = np.uint8, tilePixels = 1 << 22):
+        """
+        :param inImg:      Path to ".npy" file or to raw image file
+        :type  inImg:      str
+        :param outImg:     Path to ".npy" file for result image
+        :type  outImg:     str
+        :param shape:      Shape of raw image: (height, width) or (height, width, 3)
+        :type  shape:      tuple
+        :param dtype:      Data type of raw image
+        :type  dtype:      numpy.dtype
+        :param tilePixels: Maximum amount of pixels in one tile
+        :type  tilePixels: int
+        """
+        # Map image
+        if inImg.endswith(".npy"):
+            self.inImg = np.load(inImg, mmap_mode="r")
+        elif shape is not None:
+            self.inImg = np.memmap(inImg, dtype=dtype, mode="r", shape=tuple(shape))
+        else:
+            raise ValueError("Shape of raw image is required: {}".format(inImg))
+        # Rows
+        self.height = self.inImg.shape[0]
+        # Columns
+        self.width = self.inImg.shape[1]
+        # Tiles of whole rows are contiguous in memory map
+        self.tileRows = max(1, tilePixels // self.width)
+        # Original image backup (RGB image is converted by tiles)
+        self.origImg = self.inImg
+        # Mapped images are not cached
+        self._key = self._keyImg = None
+        # Result image
+        self.outImg = np.lib.format.open_memmap(outImg, mode="w+", dtype=np.uint8,
+            shape=(self.height, self.width))
+        # Histogram and its backup
+        self.histogram = ShadeHistogram(self.getShadeMap())
+        self.origHistogram = self.histogram
+
+    def _tiles(self):
+        """
+        Iterating over tiles of current image converted to greyscale
+
+        :return: Slice of image rows and greyscale tile (yield)
+        :rtype:  slice, numpy
+        """
+        for start in range(0, self.height, self.tileRows):
+            rows = slice(start, min(start + self.tileRows, self.height))
+            tile = self.inImg[rows]
+            if len(tile.shape) == 3: tile = greyscale.toGreyscale(tile)
+            yield rows, tile
+
+    def getShadeMap(self):
+        """
+        Creating map with the amount of each shade in one pass over tiles
+
+        :return: Shade map
+        :rtype:  numpy
+        """
+        shadeMap = np.zeros(256, dtype=np.int64)
+        for _, tile in self._tiles():
+            shadeMap += np.bincount(tile.astype(np.uint8, copy=False).ravel(), minlength=256)
+
+        return shadeMap
+
+    def _applyLUT(self, lut):
+        """
+        Replacing every shade of image with its value from lookup table tile by tile,
+        result is written to memory-mapped result image
+
+        :param lut: Lookup table with 256 shades
+        :type  lut: numpy
+        """
+        for rows, tile in self._tiles():
+            np.take(lut, tile.astype(np.uint8, copy=False), out=self.outImg[rows])
+        self.outImg.flush()
+        self.inImg = self.outImg
+
+    def adaptiveEqualization(self, tiles = (8, 8), clipLimit = 2.0):
+        """
+        Performing contrast limited adaptive histogram equalization tile by tile:
+        shade maps of equalization tiles are counted in the first pass, shades are
+        interpolated in the second one, result is written to memory-mapped result image
+
+        :param tiles:     Amount of tiles in rows and columns
+        :type  tiles:     tuple
+        :param clipLimit: Maximum amount of pixels in each shade of tile relative to
+                          its mean amount (no clipping if less than 1)
+        :type  clipLimit: float
+        """
+        grid = self._tileGrid(tiles)
+
+        # Equalization replace map of every tile
+        shadeMaps = 0
+        for rows, tile in self._tiles():
+            shadeMaps = shadeMaps + self._tileShadeMaps(tile.astype(np.uint8, copy=False), rows, grid)
+        luts = self._tileLUTs(shadeMaps, clipLimit)
+
+        for rows, tile in self._tiles():
+            self._interpolateTiles(tile.astype(np.uint8, copy=False), rows, grid, luts, self.outImg[rows])
+        self.outImg.flush()
+        self.inImg = self.outImg
+        self.histogram = ShadeHistogram(self.getShadeMap())
+
+    def saveImage(self, path, writer = None):
+        """
+        Saving image to file (".npy" files are copied tile by tile)
+
+        :param path:   Save path
+        :type  path:   str
+        :param writer: Writer saving image in background (image is saved at once by default)
+        :type  writer: ImageWriter
+        """
+        if not path.endswith(".npy"):
+            # Encoder needs the whole image
+            img = self.inImg
+            if len(img.shape) == 3: img = greyscale.toGreyscale(img)
+            if writer is not None:
+                writer.write(path, img)
+            else:
+                cv.imwrite(path, img)
+            return
+
+        outImg = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8,
+            shape=(self.height, self.width))
+        for rows, tile in self._tiles():
+            outImg[rows] = tile
+        outImg.flush()
+
+    def restoreImage(self):
+        """
+        Restoring original image and histogram from backup (mapped images are not hashed
+        for cache)
+        """
+        self.inImg = self.origImg
+        self.histogram = self.origHistogram
+        self._key = self._keyImg = None
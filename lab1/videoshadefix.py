@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import greyscale
+import numpy as np
+from shadefix import ShadeFix
+from shadehistogram import ShadeHistogram
+
+class VideoShadeFix:
+    """
+    Class for performing linear stretching and histogram equalization on greyscale video.
+    Histogram is exponentially averaged over frames, so shades of neighbouring frames
+    are replaced almost equally and result does not flicker
+
+    :ivar    video:    Loaded video
+    :vartype video:    cv2.VideoCapture
+    :ivar    height:   Height of frame
+    :vartype height:   int
+    :ivar    width:    Width of frame
+    :vartype width:    int
+    :ivar    fps:      Frames per second
+    :vartype fps:      float
+    :ivar    alpha:    Weight of current frame in averaged histogram
+    :vartype alpha:    float
+    :ivar    sample:   Step between pixels (in rows and columns) counted in frame histogram
+    :vartype sample:   int
+    :ivar    shadeMap: Averaged map with the amount of each shade
+    :vartype shadeMap: numpy
+    """
+    def __init__(self, inVideo, alpha = 0.1, sample = 2):
+        # Load video
+        self.video = cv.VideoCapture(inVideo)
+        if not self.video.isOpened():
+            raise IOError("Can't read video: {}".format(inVideo))
+        # Rows
+        self.height = int(self.video.get(cv.CAP_PROP_FRAME_HEIGHT))
+        # Columns
+        self.width = int(self.video.get(cv.CAP_PROP_FRAME_WIDTH))
+        self.fps = self.video.get(cv.CAP_PROP_FPS) or 25
+        self.alpha = alpha
+        self.sample = sample
+        # Shade Map
+        self.shadeMap = None
+
+    def _updateShadeMap(self, frame):
+        """
+        Adding histogram of frame to averaged shade map
+
+        :param frame: Greyscale frame
+        :type  frame: numpy
+        """
+        frameMap = np.bincount(frame[::self.sample, ::self.sample].ravel(), minlength=256)
+        if self.shadeMap is None:
+            self.shadeMap = frameMap.astype(np.float64)
+        else:
+            self.shadeMap *= 1 - self.alpha
+            self.shadeMap += self.alpha * frameMap
+
+    def _getLUT(self, mode):
+        """
+        Creating shades replace map from averaged shade map
+
+        :param mode: Operation ("equalization" or "stretching")
+        :type  mode: str
+        :return:     Lookup table with new value of each shade
+        :rtype:      numpy
+        """
+        if mode == "equalization":
+            return ShadeFix.equalizationLUT(self.shadeMap)
+        # Stretching of range without about 5% of pixels on its corners
+        histogram = ShadeHistogram(self.shadeMap).clip(0.05)
+        return ShadeFix.stretchingLUT(histogram.lower, histogram.upper)
+
+    def process(self, outVideo, mode = "equalization", codec = "MJPG"):
+        """
+        Performing histogram equalization or linear stretching on every frame
+        and saving result greyscale video
+
+        :param outVideo: Save path
+        :type  outVideo: str
+        :param mode:     Operation ("equalization" or "stretching")
+        :type  mode:     str
+        :param codec:    FourCC code of result video
+        :type  codec:    str
+        :return:         Amount of processed frames
+        :rtype:          int
+        """
+        if mode not in ("equalization", "stretching"):
+            raise ValueError('Undefined mode: {}. Available modes: "equalization" or "stretching"'.format(mode))
+
+        writer = cv.VideoWriter(outVideo, cv.VideoWriter_fourcc(*codec), self.fps,
+            (self.width, self.height), False)
+        if not writer.isOpened():
+            raise IOError("Can't write video: {}".format(outVideo))
+
+        # Frame buffers are reused for all frames
+        grey = np.empty((self.height, self.width), dtype=np.uint8)
+        res = np.empty((self.height, self.width), dtype=np.uint8)
+
+        count = 0
+        success, frame = self.video.read()
+        while success:
+            if len(frame.shape) == 3:
+                greyscale.toGreyscale(frame, out=grey)
+            else:
+                grey[...] = frame
+            self._updateShadeMap(grey)
+            np.take(self._getLUT(mode), grey, out=res)
+            writer.write(res)
+
+            count += 1
+            success, frame = self.video.read()
+
+        writer.release()
+        return count
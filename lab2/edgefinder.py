@@ -1,140 +1,486 @@
 #!/usr/bin/env python
 
+import cache
 import cv2 as cv
+import greyscale
+import kernels
 import numpy as np
-from matplotlib import pyplot as plt
-from math import sqrt
+import os
+from concurrent.futures import ThreadPoolExecutor
+from padding import PaddedImage
+
+# Data types of derivative approximations
+PRECISIONS = {"float64": np.float64, "float32": np.float32, "int16": np.int16}
+
+# Bounds of quantized gradient directions (tangents of 22.5 and 67.5 degrees)
+TAN_22_5 = np.float32(0.41421356)
+TAN_67_5 = np.float32(2.41421356)
 
 class EdgeFinder:
     """
     Class for edge detection on greyscale image
 
-    :ivar    inImg:    Loaded image, converted to greyscale
-    :vartype inImg:    numpy
-    :ivar    height:   Height of image
-    :vartype height:   int
-    :ivar    width:    Width of image
-    :vartype width:    int
-    :ivar    origImg:  Backup of original greyscale image
-    :vartype origImg:  numpy
+    :ivar    inImg:     Loaded image, converted to greyscale (view of padded buffer,
+                        it is overwritten by next operations)
+    :vartype inImg:     numpy
+    :ivar    height:    Height of image
+    :vartype height:    int
+    :ivar    width:     Width of image
+    :vartype width:     int
+    :ivar    origImg:   Backup of original greyscale image
+    :vartype origImg:   numpy
+    :ivar    precision: Data type of image and derivative approximations ("float64", "float32" or "int16")
+    :vartype precision: str
+    :ivar    threads:   Amount of threads processing strips of image
+    :vartype threads:   int
+    :ivar    tileRows:  Amount of image rows in one strip
+    :vartype tileRows:  int
+    :ivar    cached:    Results are taken from and added to cache (if it is enabled)
+    :vartype cached:    bool
     """
-    def __init__(self, inImg):
-        # Load image
-        self.inImg = cv.imread(inImg)
+    def __init__(self, inImg, precision = "float64", threads = 1, tilePixels = 1 << 15, cached = True):
+        # Load image (or use already loaded one) and convert it to greyscale
+        # (greyscale image of file can come from cache)
+        self.inImg = cache.loadGreyscale(inImg)
+        if self.inImg is None:
+            raise IOError("Can't read image: {}".format(inImg))
         # Rows
         self.height = self.inImg.shape[0]
         # Columns
         self.width = self.inImg.shape[1]
-        # RGB to Greyscale image
-        if len(self.inImg.shape) == 3: self.toGreyscale()
         # Greyscale image backup
         self.origImg = self.inImg
+        # Integer derivative approximations hold only differences of uint8 shades
+        if precision not in PRECISIONS:
+            raise ValueError('Undefined precision: {}. Available precisions: "float64", "float32" or "int16"'.format(precision))
+        if precision == "int16" and self.origImg.dtype != np.uint8:
+            raise ValueError("Precision int16 needs uint8 image, got {}".format(self.origImg.dtype))
+        self.precision = precision
+        dtype = PRECISIONS[precision]
+        # Current and next image with border around them
+        self._padded = [PaddedImage(self.height, self.width, dtype=dtype) for _ in range(2)]
+        self._padded[0].load(self.origImg)
+        self.inImg = self._padded[0].image
+        # Key of current image in cache (results depend on precision)
+        self.cached = cached
+        self._key, self._keyImg = self._imageKey(), self.inImg
+        # Scratch derivative approximations
+        self._Gx = np.empty((self.height, self.width), dtype=dtype)
+        self._Gy = np.empty((self.height, self.width), dtype=dtype)
+        # Scratch differences of columns and rows (first pass of separable operators)
+        self._D = np.empty((self.height + 2, self.width), dtype=dtype)
+        self._E = np.empty((self.height, self.width + 2), dtype=dtype)
+        # Strips of whole rows small enough to stay in cache, processed by thread pool
+        # (numpy releases GIL in arithmetic on slices)
+        self.threads = threads or os.cpu_count()
+        self.tileRows = max(1, tilePixels // self.width)
+        self._pool = ThreadPoolExecutor(self.threads) if self.threads > 1 else None
 
     def toGreyscale(self):
         """
         Converting RGB image to greyscale
         """
-        # Get color arrays
-        red   = self.inImg[...,2]
-        green = self.inImg[...,1]
-        blue  = self.inImg[...,0]
-        
-        # Fill array with shades of grey
-        outImg = np.zeros((self.height, self.width))
-        outImg[...] = 0.299 * red + 0.587 * green + 0.114 * blue
-        
-        # Round result shades
-        outImg = np.round(outImg)
-        
-        # Update image
-        self.inImg = outImg 
+        self.inImg = greyscale.toGreyscale(self.inImg)
 
     def _expandImage(self):
         """
-        Creating a border around of image with values of nearest pixels
+        Getting image with border of nearest pixel values around it
 
         :return: Image with border around it
         :rtype:  numpy
         """
-        expImg = np.zeros((self.height + 2, self.width + 2))
-        # Fill center of image with original image
-        expImg[1:-1,1:-1] = self.inImg
-        # Fill borders of expanded image with borders of original image
-        # (except angular pixels)
-        expImg[1:-1,0] = self.inImg[...,0]
-        expImg[1:-1,-1] = self.inImg[...,-1]
-        expImg[0,1:-1] = self.inImg[0,...]
-        expImg[-1,1:-1] = self.inImg[-1,...]
-        # Fill angular pixels
-        expImg[0,0] = self.inImg[0,0]
-        expImg[0,-1] = self.inImg[0,-1]
-        expImg[-1,0] = self.inImg[-1,0]
-        expImg[-1,-1] = self.inImg[-1,-1]
-        
-        return expImg
-
-    def findEdges(self, operator):
+        # Image was replaced from outside
+        if self.inImg is not self._padded[0].image:
+            self._padded[0].load(self.inImg)
+            self.inImg = self._padded[0].image
+        else:
+            self._padded[0].refreshBorder()
+
+        return self._padded[0].buffer
+
+    @cache.cachedStep
+    def findEdges(self, operator, norm = "l1"):
         """
         Create image with detected edges using Sobel, Prewitt or Roberts operator
 
-        :param operator: Operator for edge detection ("sobel", "prewitt" or "roberts")
+        :param operator: Operator for edge detection ("sobel", "prewitt", "roberts" or registered one)
+        :type  operator: str
+        :param norm:     Gradient magnitude: "l1" (|Gx| + |Gy|) or "l2" (sqrt(Gx^2 + Gy^2))
+        :type  norm:     str
+        """
+        if norm not in ("l1", "l2"):
+            raise ValueError('Undefined norm: {}. Available norms: "l1" or "l2"'.format(norm))
+
+        # Create image with detected edges
+        self._findG(*self._gradients(operator), norm)
+
+    def gradientMaps(self, operator, norm = "l2", bins = 8, scale = 1.0,
+                     magnitude = None, orientation = None, shades = None):
+        """
+        Create gradient magnitude, quantized gradient orientation and saturated 8-bit magnitude
+        in one pass over strips of derivative approximations (temporary arrays have strip size).
+        Orientation is angle of gradient from x axis (to the right) towards y axis (down)
+        modulo 180 degrees, so edges of both polarities have the same bin.
+        Current image is not changed
+
+        :param operator:    Operator for edge detection ("sobel", "prewitt", "roberts" or registered one)
+        :type  operator:    str
+        :param norm:        Gradient magnitude: "l1" (|Gx| + |Gy|) or "l2" (sqrt(Gx^2 + Gy^2))
+        :type  norm:        str
+        :param bins:        Amount of orientation bins in 180 degrees (not more than 256)
+        :type  bins:        int
+        :param scale:       Multiplier of magnitude in 8-bit image
+        :type  scale:       float
+        :param magnitude:   Array for magnitude (floating point)
+        :type  magnitude:   numpy
+        :param orientation: Array for orientation bins (uint8)
+        :type  orientation: numpy
+        :param shades:      Array for 8-bit magnitude (uint8)
+        :type  shades:      numpy
+        :return:            Magnitude, orientation, 8-bit magnitude
+        :rtype:             numpy, numpy, numpy
+        """
+        if norm not in ("l1", "l2"):
+            raise ValueError('Undefined norm: {}. Available norms: "l1" or "l2"'.format(norm))
+        if not 1 <= bins <= 256:
+            raise ValueError("Amount of orientation bins must be 1 - 256: {}".format(bins))
+
+        Gx, Gy = self._gradients(operator)
+
+        # Create missing results
+        shape = (self.height, self.width)
+        if magnitude is None:
+            magnitude = np.empty(shape, dtype=np.result_type(Gx.dtype, np.float32))
+        if orientation is None:
+            orientation = np.empty(shape, dtype=np.uint8)
+        if shades is None:
+            shades = np.empty(shape, dtype=np.uint8)
+
+        def strip(rows):
+            gx, gy, mag = Gx[rows], Gy[rows], magnitude[rows]
+            # Magnitude
+            if norm == "l2":
+                np.hypot(gx, gy, out=mag)
+            else:
+                np.absolute(gx, out=mag)
+                mag += np.absolute(gy)
+            # Orientation (Gx is left minus right column, so x axis is reversed),
+            # double precision keeps angles on bounds of bins in right bin
+            angle = np.arctan2(gy, np.negative(gx, dtype=np.float64))
+            angle *= bins / np.pi
+            np.floor(angle, out=angle)
+            np.remainder(angle, bins, out=angle)
+            orientation[rows] = angle
+            # Saturated 8-bit magnitude (rounded as in saving of image)
+            np.multiply(mag, scale, out=angle)
+            np.rint(angle, out=angle)
+            np.clip(angle, 0, 255, out=angle)
+            shades[rows] = angle
+
+        self._forStrips(strip)
+
+        return magnitude, orientation, shades
+
+    def _gradients(self, operator):
+        """
+        Getting horizontal and vertical derivative approximations of current image
+
+        :param operator: Operator for edge detection ("sobel", "prewitt", "roberts" or registered one)
         :type  operator: str
+        :return:         Gx, Gy
+        :rtype:          numpy, numpy
         """
-        # Create arrays for derivative approximations
-        Gx = np.zeros((self.height, self.width))
-        Gy = np.zeros((self.height, self.width))
+        # Arrays for derivative approximations
+        Gx, Gy = self._Gx, self._Gy
 
         # Expand image with border around it
         expImg = self._expandImage()
 
-        # Fill Gx and Gy
-        if operator == "sobel":
-            Gx, Gy = self._sobelEdges(expImg, Gx, Gy)
-        elif operator == "prewitt":
-            Gx, Gy = self._prewittEdges(expImg, Gx, Gy)
+        # Fill Gx and Gy by strips (expanded image and differences have one halo row
+        # on both sides of strip)
+        if operator == "sobel" or operator == "prewitt":
+            edges = self._sobelEdges if operator == "sobel" else self._prewittEdges
+            # Strips read differences of neighbour strips, so all of them are found first
+            self._forStrips(lambda rows: self._differences(expImg, rows), self.height + 2)
+            self._forStrips(lambda rows: edges(self._D[rows.start:rows.stop + 2], self._E[rows],
+                Gx[rows], Gy[rows]))
         elif operator == "roberts":
-            Gx, Gy = self._robertsEdges(expImg, Gx, Gy)
+            self._forStrips(lambda rows: self._robertsEdges(expImg[rows.start:rows.stop + 2],
+                Gx[rows], Gy[rows]))
+        elif operator in kernels.operators():
+            # Other registered operators are correlated with image as coefficient arrays
+            kernelX = kernels.getKernel(operator + "X")
+            kernelY = kernels.getKernel(operator + "Y")
+            if self.precision == "int16":
+                self._checkIntegerOperator(operator, kernelX, kernelY)
+            pad = max(kernelX.shape + kernelY.shape) // 2
+            if pad > 1:
+                expImg = np.pad(self.inImg, pad, mode="edge")
+            for kernel, G in ((kernelX, Gx), (kernelY, Gy)):
+                top = pad - kernel.shape[0] // 2
+                left = pad - kernel.shape[1] // 2
+                kernels.correlate(expImg[top:expImg.shape[0] - top, left:expImg.shape[1] - left], kernel, G)
         else:
-            raise ValueError('Undefined operator: {}. Available operators: "sobel", "prewitt" or "roberts"'.format(type))
-        
-        # Create image with detected edges
-        self._findG(Gx, Gy)
+            self._undefinedOperator(operator)
+
+        return Gx, Gy
 
     @staticmethod
-    def _sobelEdges(expImg, Gx, Gy):
+    def _checkIntegerOperator(operator, kernelX, kernelY):
         """
-        Getting horizontal and vertical derivative approximations with using of Sobel operator
+        Raising error if int16 derivative approximations (and their magnitude) can't hold
+        results of operator: its kernels must be integer and sum of absolute values
+        of their coefficients times 255 must fit int16
 
-        :param expImg: Image expanded with borders 
+        :param operator: Operator for edge detection
+        :type  operator: str
+        :param kernelX:  Kernel of horizontal derivative approximation
+        :type  kernelX:  numpy
+        :param kernelY:  Kernel of vertical derivative approximation
+        :type  kernelY:  numpy
+        """
+        if any(np.any(kernel != np.round(kernel)) for kernel in (kernelX, kernelY)):
+            raise ValueError("Precision int16 needs integer kernels of operator: {}".format(operator))
+        if 255 * (np.abs(kernelX).sum() + np.abs(kernelY).sum()) > np.iinfo(np.int16).max:
+            raise ValueError("Precision int16 overflows with kernels of operator: {}".format(operator))
+
+    @staticmethod
+    def _undefinedOperator(operator):
+        """
+        Raising error about operator which is not registered
+
+        :param operator: Operator for edge detection
+        :type  operator: str
+        """
+        raise ValueError("Undefined operator: {}. Available operators: {}".format(operator,
+            ", ".join('"{}"'.format(name) for name in kernels.operators())))
+
+    def _forStrips(self, func, height = None):
+        """
+        Calling function for every strip of rows on thread pool and waiting for all of them
+
+        :param func:   Function processing slice of rows
+        :type  func:   function
+        :param height: Amount of rows (height of image by default)
+        :type  height: int
+        """
+        if height is None:
+            height = self.height
+        strips = [slice(start, min(start + self.tileRows, height)) for start in range(0, height, self.tileRows)]
+        if self._pool is None:
+            for rows in strips:
+                func(rows)
+        else:
+            # Exceptions of threads are raised here
+            for _ in self._pool.map(func, strips):
+                pass
+
+    @cache.cachedStep
+    def cannyEdges(self, lowThreshold, highThreshold, operator = "sobel"):
+        """
+        Create image with thin edges using Canny algorithm: non-maximum suppression
+        of gradient magnitude |Gx| + |Gy| along quantized gradient direction,
+        double thresholding and linking of weak edges to strong ones
+
+        :param lowThreshold:  Lowest magnitude of weak edge
+        :type  lowThreshold:  float
+        :param highThreshold: Lowest magnitude of strong edge
+        :type  highThreshold: float
+        :param operator:      Operator for edge detection ("sobel", "prewitt", "roberts" or registered one)
+        :type  operator:      str
+        """
+        Gx, Gy = self._gradients(operator)
+
+        # Magnitude with zero border, so pixels on image border can be maximums
+        magPad = np.zeros((self.height + 2, self.width + 2), dtype=Gx.dtype)
+        mag = magPad[1:-1,1:-1]
+        np.absolute(Gx, out=mag)
+        mag += np.absolute(Gy)
+
+        # Only pixels above low threshold can be edges, their indices in image and padded magnitude
+        index = np.flatnonzero(mag >= lowThreshold)
+        padIndex = index + 2 * (index // self.width) + self.width + 3
+        gx = Gx.ravel()[index]
+        gy = Gy.ravel()[index]
+        absGx = np.absolute(gx).astype(np.float32)
+        absGy = np.absolute(gy).astype(np.float32)
+
+        # Quantize gradient direction to horizontal, vertical or one of diagonals
+        # and take offset of neighbour along it in padded magnitude
+        # (Gx is left minus right column, so gradient goes down-right when signs differ)
+        rowStep = self.width + 2
+        offset = np.where(absGy <= absGx * TAN_22_5, 1,
+                 np.where(absGy > absGx * TAN_67_5, rowStep,
+                 np.where((gx < 0) != (gy < 0), rowStep + 1, rowStep - 1)))
+
+        # Non-maximum suppression: keep pixels not weaker than both neighbours along gradient
+        # (strictly stronger than the first one, so plateaus give one pixel wide edges)
+        flatMag = magPad.ravel()
+        value = flatMag[padIndex]
+        maximum = (value > flatMag[padIndex - offset]) & (value >= flatMag[padIndex + offset])
+
+        # Double thresholding
+        weak = np.zeros((self.height, self.width), dtype=np.uint8)
+        weak.ravel()[index[maximum]] = 1
+        strong = index[maximum & (value >= highThreshold)]
+
+        # Hysteresis: keep 8-connected components of weak edges with at least one strong pixel
+        count, labels = cv.connectedComponents(weak, connectivity=8)
+        linked = np.zeros(count, dtype=bool)
+        linked[labels.ravel()[strong]] = True
+        linked[0] = False
+
+        # Result is written to next padded image which becomes current one
+        self._padded.reverse()
+        self._padded[0].image[...] = 0
+        self._padded[0].image[linked[labels]] = 255
+        self.inImg = self._padded[0].image
+
+    def findEdgesMulti(self, operators):
+        """
+        Create images with detected edges using several operators in one pass.
+        Sobel and Prewitt share differences of neighbouring columns and rows,
+        current image is not changed
+
+        :param operators: Operators for edge detection ("sobel", "prewitt", "roberts" or registered one)
+        :type  operators: list
+        :return:          Image with detected edges for every operator
+        :rtype:           dict
+        """
+        operators = list(dict.fromkeys(operators))
+        for operator in operators:
+            if operator not in kernels.operators():
+                self._undefinedOperator(operator)
+
+        # Results of findEdges() with the same operators are taken from cache
+        keys = {operator: cache.resultKey(self, "findEdges", operator, "l1") for operator in operators}
+        cached = {operator: cache.get(keys[operator]) for operator in operators}
+        computed = [operator for operator in operators if cached[operator] is None]
+
+        # Arrays for derivative approximations and their absolute values
+        Gx, Gy = self._Gx, self._Gy
+        absG = np.empty_like(Gx)
+
+        # Expand image with border around it
+        expImg = self._expandImage()
+
+        results = {}
+        if "sobel" in computed or "prewitt" in computed:
+            # Prewitt sums differences of three rows (columns)
+            D, E = self._differences(expImg)
+            Gx, Gy = self._prewittEdges(D, E, Gx, Gy)
+            if "prewitt" in computed:
+                results["prewitt"] = self._magnitude(Gx, Gy, absG)
+
+            # Sobel counts middle row (column) twice
+            if "sobel" in computed:
+                Gx += D[1:-1]
+                Gy += E[:,1:-1]
+                results["sobel"] = self._magnitude(Gx, Gy, absG)
+
+        if "roberts" in computed:
+            Gx, Gy = self._robertsEdges(expImg, Gx, Gy)
+            results["roberts"] = self._magnitude(Gx, Gy, absG)
+
+        # Other registered operators, computed results are cached
+        for operator in computed:
+            if operator not in results:
+                results[operator] = self._magnitude(*self._gradients(operator), absG)
+            cache.put(keys[operator], results[operator])
+        for operator in operators:
+            if operator not in results:
+                results[operator] = np.array(cached[operator])
+
+        return {operator: results[operator] for operator in operators}
+
+    @staticmethod
+    def _magnitude(Gx, Gy, absG):
+        """
+        Getting sum of absolute values of derivative approximations
+
+        :param Gx:   Horizontal derivative approximation array/image
+        :type  Gx:   numpy
+        :param Gy:   Vertical derivative approximation array/image
+        :type  Gy:   numpy
+        :param absG: Array for absolute values
+        :type  absG: numpy
+        :return:     Image with detected edges
+        :rtype:      numpy
+        """
+        resImg = np.absolute(Gx)
+        resImg += np.absolute(Gy, out=absG)
+
+        return resImg
+
+    def _differences(self, expImg, rows = None):
+        """
+        Getting differences of left and right columns and of lower and upper rows
+        (first pass of separable Sobel and Prewitt operators)
+
+        :param expImg: Image expanded with borders
         :type  expImg: numpy
-        :param Gx:     Horizontal derivative approximation array/image
-        :type  Gx:     numpy
-        :param Gy:     Vertical derivative approximation array/image
-        :type  Gy:     numpy
-        :return:       Gx, Gy
+        :param rows:   Rows of expanded image to process (all by default)
+        :type  rows:   slice
+        :return:       Differences of columns (one row more on both sides than image),
+                       differences of rows (one column more on both sides than image)
         :rtype:        numpy, numpy
         """
-        Gx[...] = expImg[0:-2,0:-2] - expImg[0:-2,2:] + 2*(expImg[1:-1,0:-2] - expImg[1:-1,2:]) + expImg[2:,0:-2] - expImg[2:,2:]
-        Gy[...] = expImg[2:,0:-2] - expImg[0:-2,0:-2] + 2*(expImg[2:,1:-1] - expImg[0:-2,1:-1]) + expImg[2:,2:] - expImg[0:-2,2:]
+        if rows is None:
+            rows = slice(0, self.height + 2)
+        np.subtract(expImg[rows,0:-2], expImg[rows,2:], out=self._D[rows])
+        # Differences of rows exist only for rows of image
+        rows = slice(rows.start, min(rows.stop, self.height))
+        np.subtract(expImg[rows.start + 2:rows.stop + 2], expImg[rows], out=self._E[rows])
+
+        return self._D, self._E
+
+    @staticmethod
+    def _sobelEdges(D, E, Gx, Gy):
+        """
+        Getting horizontal and vertical derivative approximations with using of Sobel operator
+        (second pass smooths differences with 1, 2, 1 weights)
+
+        :param D:  Differences of columns
+        :type  D:  numpy
+        :param E:  Differences of rows
+        :type  E:  numpy
+        :param Gx: Horizontal derivative approximation array/image
+        :type  Gx: numpy
+        :param Gy: Vertical derivative approximation array/image
+        :type  Gy: numpy
+        :return:   Gx, Gy
+        :rtype:    numpy, numpy
+        """
+        np.add(D[1:-1], D[1:-1], out=Gx)
+        Gx += D[0:-2]
+        Gx += D[2:]
+        np.add(E[:,1:-1], E[:,1:-1], out=Gy)
+        Gy += E[:,0:-2]
+        Gy += E[:,2:]
 
         return Gx, Gy
 
     @staticmethod
-    def _prewittEdges(expImg, Gx, Gy):
+    def _prewittEdges(D, E, Gx, Gy):
         """
         Getting horizontal and vertical derivative approximations with using of Prewitt operator
+        (second pass sums three differences)
 
-        :param expImg: Image expanded with borders 
-        :type  expImg: numpy
-        :param Gx:     Horizontal derivative approximation array/image
-        :type  Gx:     numpy
-        :param Gy:     Vertical derivative approximation array/image
-        :type  Gy:     numpy
-        :return:       Gx, Gy
-        :rtype:        numpy, numpy
+        :param D:  Differences of columns
+        :type  D:  numpy
+        :param E:  Differences of rows
+        :type  E:  numpy
+        :param Gx: Horizontal derivative approximation array/image
+        :type  Gx: numpy
+        :param Gy: Vertical derivative approximation array/image
+        :type  Gy: numpy
+        :return:   Gx, Gy
+        :rtype:    numpy, numpy
         """
-        Gx[...] = expImg[0:-2,0:-2] - expImg[0:-2,2:] + expImg[1:-1,0:-2] - expImg[1:-1,2:] + expImg[2:,0:-2] - expImg[2:,2:]
-        Gy[...] = expImg[2:,0:-2] - expImg[0:-2,0:-2] + expImg[2:,1:-1] - expImg[0:-2,1:-1] + expImg[2:,2:] - expImg[0:-2,2:]
+        np.add(D[0:-2], D[1:-1], out=Gx)
+        Gx += D[2:]
+        np.add(E[:,0:-2], E[:,1:-1], out=Gy)
+        Gy += E[:,2:]
 
         return Gx, Gy
 
@@ -152,32 +498,99 @@ class EdgeFinder:
         :return:       Gx, Gy
         :rtype:        numpy, numpy
         """
-        Gx[...] = expImg[1:-1,1:-1] - expImg[2:,2:]
-        Gy[...] = expImg[1:-1,2:] - expImg[2:,1:-1]
+        np.subtract(expImg[1:-1,1:-1], expImg[2:,2:], out=Gx)
+        np.subtract(expImg[1:-1,2:], expImg[2:,1:-1], out=Gy)
 
         return Gx, Gy
 
-    def _findG(self, Gx, Gy):
+    def _findG(self, Gx, Gy, norm = "l1"):
         """
         Create result image using filled horizontal and vertical derivative approximations
+
+        :param Gx:   Horizontal derivative approximation array/image
+        :type  Gx:   numpy
+        :param Gy:   Vertical derivative approximation array/image
+        :type  Gy:   numpy
+        :param norm: Gradient magnitude ("l1" or "l2")
+        :type  norm: str
+        """
+        # Result is written to next padded image which becomes current one
+        self._padded.reverse()
+        resImg = self._padded[0].image
+
+        def strip(rows):
+            if norm == "l2":
+                # Integer images get rounded magnitude
+                if np.issubdtype(resImg.dtype, np.integer):
+                    np.rint(np.hypot(Gx[rows], Gy[rows]), out=resImg[rows], casting="unsafe")
+                else:
+                    np.hypot(Gx[rows], Gy[rows], out=resImg[rows])
+                return
+            # Get absolute values
+            np.absolute(Gx[rows], out=Gx[rows])
+            np.absolute(Gy[rows], out=Gy[rows])
+            np.add(Gx[rows], Gy[rows], out=resImg[rows])
+
+        self._forStrips(strip)
+        self.inImg = resImg
+
+    def _loadCached(self, img):
+        """
+        Making cached result of operation current image
+
+        :param img: Result image
+        :type  img: numpy
         """
-        # Get absolute values
-        Gx = np.absolute(Gx)
-        Gy = np.absolute(Gy)
-        
-        self.inImg = Gx + Gy
+        self._padded.reverse()
+        self._padded[0].image[...] = img
+        self.inImg = self._padded[0].image
 
-    def saveImage(self, path):
+    def saveImage(self, path, writer = None):
         """
         Saving image to file
 
-        :param path: Save path
-        :type  path: str
+        :param path:   Save path
+        :type  path:   str
+        :param writer: Writer saving image in background (image is saved at once by default)
+        :type  writer: ImageWriter
         """
-        cv.imwrite(path, self.inImg)
+        if writer is not None:
+            writer.write(path, self.inImg)
+        else:
+            cv.imwrite(path, self.inImg)
 
     def restoreImage(self):
         """
-        Restoring original greyscale image and shade map from backup
+        Restoring original greyscale image from backup
+        """
+        self._padded[0].load(self.origImg)
+        self.inImg = self._padded[0].image
+        # Original image can be changed from outside, so its key is made again
+        self._key, self._keyImg = self._imageKey(), self.inImg
+
+    def _imageKey(self):
+        """
+        Key of original image in cache (results depend on precision)
+
+        :return: Key or None if results are not cached
+        :rtype:  str
+        """
+        return cache.imageKey(self.origImg, self.precision) if self.cached else None
+
+    @staticmethod
+    def _keyKernels(name, args):
+        """
+        Kernels of registered operators in arguments of cached operation
+        (Sobel, Prewitt and Roberts operators do not use registry)
+
+        :param name: Name of operation
+        :type  name: str
+        :param args: All arguments of operation
+        :type  args: tuple
+        :return:     Coefficients of kernels
+        :rtype:      list
         """
-        self.inImg = self.origImg
\ No newline at end of file
+        operators = kernels.operators()
+        return [kernels.getKernel(arg + axis) for arg in args
+            if isinstance(arg, str) and arg not in ("sobel", "prewitt", "roberts") and arg in operators
+            for axis in "XY"]
\ No newline at end of file
@@ -1,31 +1,39 @@
 #!/usr/bin/env python
 
-from edgefinder import EdgeFinder
 import os, sys
 
+# Modules shared by labs are in common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common"))
+
+from edgefinder import EdgeFinder
+from imagewriter import ImageWriter
+
 # Create output directory
 dirname = "out"
 if not os.path.exists(dirname): os.mkdir(dirname)
 
+# Images are encoded in background while next ones are processed
+writer = ImageWriter()
+
 # Load image
 if len(sys.argv) > 1:
 	img = EdgeFinder(sys.argv[1])
 else:
 	img = EdgeFinder("test.jpg")
 
-imgName  = [dirname + "/{}.png".format(i) for i in ["grey", "sobel", "prewitt", "roberts"]]
+imgName  = [dirname + "/{}.png".format(i) for i in ["grey", "sobel", "prewitt", "roberts", "canny"]]
 
 # Save greyscale image
-img.saveImage(imgName[0])
+img.saveImage(imgName[0], writer)
 
-# Use operators and save results to files
-img.findEdges("sobel")
-img.saveImage(imgName[1])
+# Use all operators in one pass and save results to files
+results = img.findEdgesMulti(["sobel", "prewitt", "roberts"])
+for name, resImg in zip(imgName[1:], results.values()):
+	writer.write(name, resImg)
 
-img.restoreImage()
-img.findEdges("prewitt")
-img.saveImage(imgName[2])
+# Thin edges with Canny algorithm on Sobel derivatives
+img.cannyEdges(100, 200)
+img.saveImage(imgName[4], writer)
 
-img.restoreImage()
-img.findEdges("roberts")
-img.saveImage(imgName[3])
\ No newline at end of file
+# Wait until all images are saved
+writer.close()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import greyscale
+import kernels
+import numpy as np
+from edgefinder import EdgeFinder
+
+class EdgePyramid:
+    """
+    Gaussian pyramid of greyscale image for edge detection on several scales.
+    Every level is smoothed with 3x3 Gauss operator and decimated by 2 in both directions,
+    levels are computed only when they are needed and kept for next calls
+
+    :ivar    height:    Height of original image
+    :vartype height:    int
+    :ivar    width:     Width of original image
+    :vartype width:     int
+    :ivar    precision: Data type of derivative approximations ("float64" or "float32")
+    :vartype precision: str
+    """
+    def __init__(self, inImg, precision = "float64"):
+        # Load image (or use already loaded one)
+        img = inImg if isinstance(inImg, np.ndarray) else cv.imread(inImg)
+        if img is None:
+            raise IOError("Can't read image: {}".format(inImg))
+        # RGB to Greyscale image
+        if len(img.shape) == 3: img = greyscale.toGreyscale(img)
+        # Rows
+        self.height = img.shape[0]
+        # Columns
+        self.width = img.shape[1]
+        self.precision = precision
+        # Levels computed so far (the first one is original image)
+        self._levels = [img]
+        # Edge finders of whole levels (their buffers are reused by next calls)
+        self._finders = {}
+
+    def level(self, n):
+        """
+        Getting image of pyramid level
+
+        :param n: Level (0 is original image, every next one is twice smaller)
+        :type  n: int
+        :return:  Image of level
+        :rtype:   numpy
+        """
+        while len(self._levels) <= n:
+            self._levels.append(self._reduce(self._levels[-1]))
+
+        return self._levels[n]
+
+    @classmethod
+    def _reduce(cls, img):
+        """
+        Smoothing image with 3x3 Gauss operator and taking every second row and column.
+        Smoothing is separable and computed only in taken rows and columns straight from
+        strided slices of image (border rows and columns are repeated), so it costs about
+        quarter of smoothing of whole image
+
+        :param img: Image
+        :type  img: numpy
+        :return:    Twice smaller image
+        :rtype:     numpy
+        """
+        height, width = img.shape
+        kernel = kernels.getKernel("gauss3")
+        column, row = kernels.factorize(kernel)
+
+        # Taken rows and columns
+        rows = (height + 1) // 2
+        cols = (width + 1) // 2
+
+        # Sums of uint8 image with small nonnegative integer kernel are exact in uint16
+        # (they are the same as in float64, but they are faster)
+        exact = (img.dtype == np.uint8 and kernel.dtype.kind in "iu" and (column >= 0).all() and (row >= 0).all()
+            and kernel.sum() * 255 <= np.iinfo(np.uint16).max)
+        dtype = np.dtype(np.uint16 if exact else np.float64)
+
+        # Vertical pass in taken rows, then horizontal pass in taken columns
+        # (columns are rows of transposed views)
+        tmp = np.empty((rows, width), dtype=dtype)
+        scratch = np.empty((rows, width), dtype=dtype)
+        cls._reducePass(img, [(dtype.type(weight), r - column.shape[0] // 2) for weight, r, _ in kernels.kernelTerms(column)],
+            tmp, scratch)
+        resImg = np.empty((rows, cols), dtype=dtype)
+        cls._reducePass(tmp.T, [(dtype.type(weight), c - row.shape[1] // 2) for weight, _, c in kernels.kernelTerms(row)],
+            resImg.T, scratch[:, :cols].T)
+        if exact:
+            return np.true_divide(resImg, kernel.sum())
+        resImg /= kernel.sum()
+
+        return resImg
+
+    @staticmethod
+    def _reducePass(src, terms, out, scratch):
+        """
+        Correlating every second row of image (starting with the first one) with column kernel.
+        Rows of image are read as strided slices, rows over border repeat border rows
+
+        :param src:     Image
+        :type  src:     numpy
+        :param terms:   Weight and row offset of every nonzero term of kernel
+        :type  terms:   list
+        :param out:     Result array (twice less rows than image, rounded up)
+        :type  out:     numpy
+        :param scratch: Scratch array (result size)
+        :type  scratch: numpy
+        """
+        height = src.shape[0]
+        rows = out.shape[0]
+        for i, (weight, offset) in enumerate(terms):
+            # Result rows whose term row is inside of image
+            lo = max(0, -(offset // 2))
+            hi = min(rows, (height - 1 - offset) // 2 + 1)
+            if hi > lo:
+                band = src[2 * lo + offset:2 * hi - 1 + offset:2]
+                if i == 0:
+                    np.multiply(band, weight, out=out[lo:hi])
+                elif weight == 1:
+                    out[lo:hi] += band
+                else:
+                    np.multiply(band, weight, out=scratch[lo:hi])
+                    out[lo:hi] += scratch[lo:hi]
+            # Result rows on border
+            for r in list(range(min(lo, rows))) + list(range(max(lo, hi), rows)):
+                value = weight * src[min(max(2 * r + offset, 0), height - 1)]
+                if i == 0:
+                    out[r] = value
+                else:
+                    out[r] += value
+
+    def findEdges(self, operator, level = 0, region = None, norm = "l1"):
+        """
+        Create image with detected edges on pyramid level or in its region.
+        Region is processed with surrounding pixels as wide as radius of operator kernels,
+        so result is the same as in image with edges of whole level
+
+        :param operator: Operator for edge detection ("sobel", "prewitt", "roberts" or registered one)
+        :type  operator: str
+        :param level:    Level of pyramid
+        :type  level:    int
+        :param region:   Rows and columns of region in level (top, left, bottom, right), whole level by default
+        :type  region:   tuple
+        :param norm:     Gradient magnitude ("l1" or "l2")
+        :type  norm:     str
+        :return:         Image with detected edges
+        :rtype:          numpy
+        """
+        img = self.level(level)
+        if region is None or tuple(region) == (0, 0, img.shape[0], img.shape[1]):
+            if level not in self._finders:
+                self._finders[level] = EdgeFinder(img, self.precision)
+            else:
+                self._finders[level].restoreImage()
+            finder = self._finders[level]
+            finder.findEdges(operator, norm)
+            return finder.inImg.copy()
+        top, left, bottom, right = region
+
+        # Radius of operator kernels in rows and columns
+        if operator not in kernels.operators():
+            EdgeFinder._undefinedOperator(operator)
+        operatorKernels = [kernels.getKernel(operator + axis) for axis in "XY"]
+        haloRows = max(kernel.shape[0] // 2 for kernel in operatorKernels)
+        haloCols = max(kernel.shape[1] // 2 for kernel in operatorKernels)
+
+        # Region with surrounding pixels inside of level
+        outerTop, outerLeft = max(top - haloRows, 0), max(left - haloCols, 0)
+        outerBottom, outerRight = min(bottom + haloRows, img.shape[0]), min(right + haloCols, img.shape[1])
+
+        finder = EdgeFinder(img[outerTop:outerBottom, outerLeft:outerRight], self.precision)
+        finder.findEdges(operator, norm)
+
+        return finder.inImg[top - outerTop:bottom - outerTop, left - outerLeft:right - outerLeft].copy()
+
+    def edgeRegion(self, operator, threshold, level, margin = 0):
+        """
+        Finding region of original image with all edges detected on coarse pyramid level
+
+        :param operator:  Operator for edge detection ("sobel", "prewitt", "roberts" or registered one)
+        :type  operator:  str
+        :param threshold: Lowest magnitude of edge on level
+        :type  threshold: float
+        :param level:     Level of pyramid
+        :type  level:     int
+        :param margin:    Pixels of original image added on every side of region
+        :type  margin:    int
+        :return:          Rows and columns of region in original image (top, left, bottom, right)
+                          or None if there are no edges
+        :rtype:           tuple
+        """
+        rows, cols = np.nonzero(self.findEdges(operator, level) >= threshold)
+        if len(rows) == 0:
+            return None
+
+        # Pixel of level covers square of original pixels
+        scale = 2 ** level
+        return (max(int(rows.min()) * scale - margin, 0), max(int(cols.min()) * scale - margin, 0),
+            min((int(rows.max()) + 1) * scale + margin, self.height), min((int(cols.max()) + 1) * scale + margin, self.width))
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+import os, sys
+
+# Modules shared by labs are in common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common"))
+
+from videoedgefinder import VideoEdgeFinder
+
+if len(sys.argv) < 2:
+	print("Usage: video.py <input video> [output video] [operator]")
+	sys.exit(1)
+
+# Load video
+video = VideoEdgeFinder(sys.argv[1], sys.argv[3] if len(sys.argv) > 3 else "sobel")
+outVideo = sys.argv[2] if len(sys.argv) > 2 else "edges.avi"
+
+# Find edges on all frames and report throughput of pipeline
+stats = video.process(outVideo)
+print("Frames: {} in {:.2f}s ({:.1f} fps)".format(stats["frames"], stats["seconds"], stats["fps"]))
+print("Decoded frames queue depth: mean {:.1f}, max {}".format(*stats["decodedQueue"]))
+print("Detected frames queue depth: mean {:.1f}, max {}".format(*stats["detectedQueue"]))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import cv2 as cv
+import greyscale
+import kernels
+import numpy as np
+import os
+import queue
+import threading
+import time
+from edgefinder import EdgeFinder
+
+class VideoEdgeFinder:
+    """
+    Class for edge detection on every frame of video. Frames are decoded by producer thread,
+    edges are found by pool of worker threads and written in original order by consumer thread.
+    Bounded queues between stages stop faster stage when slower one falls behind, frames
+    waiting for previous ones in consumer count to limit of frames in flight too
+
+    :ivar    video:     Loaded video
+    :vartype video:     cv2.VideoCapture
+    :ivar    height:    Height of frame
+    :vartype height:    int
+    :ivar    width:     Width of frame
+    :vartype width:     int
+    :ivar    fps:       Frames per second
+    :vartype fps:       float
+    :ivar    operator:  Operator for edge detection
+    :vartype operator:  str
+    :ivar    precision: Data type of derivative approximations ("float64", "float32" or "int16")
+    :vartype precision: str
+    :ivar    workers:   Amount of worker threads
+    :vartype workers:   int
+    :ivar    queueSize: Maximum amount of frames in every queue
+    :vartype queueSize: int
+    """
+    def __init__(self, inVideo, operator = "sobel", precision = "float64", workers = None, queueSize = 8):
+        # Load video
+        self.video = cv.VideoCapture(inVideo)
+        if not self.video.isOpened():
+            raise IOError("Can't read video: {}".format(inVideo))
+        # Rows
+        self.height = int(self.video.get(cv.CAP_PROP_FRAME_HEIGHT))
+        # Columns
+        self.width = int(self.video.get(cv.CAP_PROP_FRAME_WIDTH))
+        self.fps = self.video.get(cv.CAP_PROP_FPS) or 25
+        if operator not in kernels.operators():
+            EdgeFinder._undefinedOperator(operator)
+        self.operator = operator
+        self.precision = precision
+        self.workers = workers or os.cpu_count()
+        self.queueSize = queueSize
+
+    def process(self, outVideo, codec = "MJPG"):
+        """
+        Finding edges on every frame and saving result greyscale video
+
+        :param outVideo: Save path
+        :type  outVideo: str
+        :param codec:    FourCC code of result video
+        :type  codec:    str
+        :return:         Amount of frames, time, frames per second, mean and maximum depth
+                         of decoded and detected frame queues
+        :rtype:          dict
+        """
+        writer = cv.VideoWriter(outVideo, cv.VideoWriter_fourcc(*codec), self.fps,
+            (self.width, self.height), False)
+        if not writer.isOpened():
+            raise IOError("Can't write video: {}".format(outVideo))
+
+        # Decoded frames (index, frame) and frames with edges (index, edges),
+        # None marks end of stream of every worker
+        decoded = queue.Queue(self.queueSize)
+        detected = queue.Queue(self.queueSize)
+        # Decoded frames which are not written yet (with reordered ones waiting in consumer)
+        inFlight = threading.Semaphore(self.queueSize + self.workers)
+        # Error of any stage stops all of them
+        stop = threading.Event()
+        errors = []
+        stats = {"frames": 0, "decoded": [], "detected": []}
+
+        def produce():
+            try:
+                index = 0
+                success, frame = self.video.read()
+                while success and not stop.is_set():
+                    # Stop is checked again while waiting for written frames
+                    if not inFlight.acquire(timeout=0.1):
+                        continue
+                    decoded.put((index, frame))
+                    index += 1
+                    success, frame = self.video.read()
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                for _ in range(self.workers):
+                    decoded.put(None)
+
+        def work():
+            # Every worker reuses its greyscale frame and edge finder buffers
+            grey = np.empty((self.height, self.width), dtype=np.uint8)
+            finder = None
+            try:
+                item = decoded.get()
+                while item is not None:
+                    index, frame = item
+                    if not stop.is_set():
+                        if len(frame.shape) == 3:
+                            greyscale.toGreyscale(frame, out=grey)
+                        else:
+                            grey[...] = frame
+                        if finder is None:
+                            # Frames are not repeated, caching them would only evict useful results
+                            finder = EdgeFinder(grey, self.precision, cached=False)
+                        else:
+                            finder.restoreImage()
+                        finder.findEdges(self.operator)
+                        # Saturate shades to 8 bits of video
+                        edges = np.empty((self.height, self.width), dtype=np.uint8)
+                        np.clip(finder.inImg, 0, 255, out=edges, casting="unsafe")
+                        detected.put((index, edges))
+                    item = decoded.get()
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+                # Rest of frames is taken, so producer is not blocked
+                while decoded.get() is not None:
+                    pass
+            finally:
+                detected.put(None)
+
+        def consume():
+            # Frames which came before previous ones wait for them
+            pending = {}
+            ended = 0
+            while ended < self.workers:
+                stats["decoded"].append(decoded.qsize())
+                stats["detected"].append(detected.qsize())
+                item = detected.get()
+                if item is None:
+                    ended += 1
+                    continue
+                pending[item[0]] = item[1]
+                try:
+                    while stats["frames"] in pending and not stop.is_set():
+                        writer.write(pending.pop(stats["frames"]))
+                        stats["frames"] += 1
+                        inFlight.release()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                if stop.is_set():
+                    pending.clear()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=produce), threading.Thread(target=consume)]
+        threads += [threading.Thread(target=work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        writer.release()
+
+        if errors:
+            raise errors[0]
+
+        return {
+            "frames": stats["frames"],
+            "seconds": seconds,
+            "fps": stats["frames"] / seconds if seconds > 0 else 0.0,
+            "decodedQueue": (float(np.mean(stats["decoded"] or [0])), max(stats["decoded"] or [0])),
+            "detectedQueue": (float(np.mean(stats["detected"] or [0])), max(stats["detected"] or [0])),
+        }
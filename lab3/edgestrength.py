@@ -1,15 +1,31 @@
 #!/usr/bin/env python
 
+import cache
 import cv2 as cv
+import gaussian
+import greyscale
+import integral
+import kernels
 import numpy as np
-from matplotlib import pyplot as plt
+from elementwise import STRENGTHEN_STEPS, applySteps, lsLaplacianSteps
 from math import sqrt
+from padding import PaddedImage
+
+# Ratio of sigmas of Gauss filters in difference of Gaussians
+DOG_RATIO = 1.6
+
+# Limit of Gauss levels of difference of Gaussians kept for next calls
+GAUSS_LEVELS = 4
+
+# Registered kernels of cached steps (their coefficients and divisors are part of keys of results)
+STEP_KERNELS = {"gaussSmoothing": "gauss3", "gaussSmoothingTwice": "gauss5", "_laplacian": "laplacian"}
 
 class EdgeStrength:
     """
     Class for edge strengthening on greyscale image
 
-    :ivar    inImg:    Loaded image, converted to greyscale
+    :ivar    inImg:    Loaded image, converted to greyscale (view of padded buffer,
+                       it is overwritten by next operations)
     :vartype inImg:    numpy
     :ivar    height:   Height of image
     :vartype height:   int
@@ -19,65 +35,87 @@ class EdgeStrength:
     :vartype origImg:  numpy
     """
     def __init__(self, inImg):
-        # Load image
-        self.inImg = cv.imread(inImg)
+        # Load image (or use already loaded one) and convert it to greyscale
+        # (greyscale image of file can come from cache)
+        self.inImg = cache.loadGreyscale(inImg)
+        if self.inImg is None:
+            raise IOError("Can't read image: {}".format(inImg))
         # Rows
         self.height = self.inImg.shape[0]
         # Columns
         self.width = self.inImg.shape[1]
-        # RGB to Greyscale image
-        if len(self.inImg.shape) == 3: self.toGreyscale()
         # Greyscale image backup
         self.origImg = self.inImg
+        # Current and next image with border around them
+        self._padded = [PaddedImage(self.height, self.width, 2) for _ in range(2)]
+        self._padded[0].load(self.origImg)
+        self.inImg = self._padded[0].image
+        # Key of current image in cache
+        self._key, self._keyImg = cache.imageKey(self.origImg), self.inImg
+        # Scratch arrays for weighted terms and for vertical pass of separable kernels
+        self._scratch = np.empty((self.height, self.width))
+        self._tmp = np.empty((self.height, self.width + 4))
+        # Result and scratch arrays of float32 Gauss and LoG filters (created with the first use)
+        self._gaussBuffers = None
+        # Current image smoothed with Gauss filters by sigma (levels of difference of Gaussians)
+        # and copy of image they were computed from (created with the first use)
+        self._gaussLevels = {}
+        self._levelsImg = None
+        # Summed-area table of box filters (created with the first use)
+        self._table = None
 
     def toGreyscale(self):
         """
         Converting RGB image to greyscale
         """
-        # Get color arrays
-        red   = self.inImg[...,2]
-        green = self.inImg[...,1]
-        blue  = self.inImg[...,0]
-        
-        # Fill array with shades of grey
-        outImg = np.zeros((self.height, self.width))
-        outImg[...] = 0.299 * red + 0.587 * green + 0.114 * blue
-        
-        # Round result shades
-        outImg = np.round(outImg)
-        
-        # Update image
-        self.inImg = outImg 
-
-    def _expandImage(self, img = None):
-        """
-        Creating a border around of image with values of nearest pixels
-
-        :return: Image with border around it
+        self.inImg = greyscale.toGreyscale(self.inImg)
+
+    def _expandImage(self, pad = 1):
+        """
+        Getting image with border of nearest pixel values around it
+
+        :param pad: Width of border (1 or 2)
+        :type  pad: int
+        :return:    Image with border around it
+        :rtype:     numpy
+        """
+        # Image was replaced from outside
+        if self.inImg is not self._padded[0].image:
+            self._padded[0].load(self.inImg)
+            self.inImg = self._padded[0].image
+        else:
+            self._padded[0].refreshBorder()
+
+        return self._padded[0].expanded(pad)
+
+    def _nextImage(self):
+        """
+        Making next padded image current one, its content is overwritten by result of operation
+
+        :return: Image without border
         :rtype:  numpy
         """
-        if img is None:
-            img = self.inImg
-        height = img.shape[0]
-        width  = img.shape[1]
-        expImg = np.zeros((height + 2, width + 2))
-
-        # Fill center of image with original image
-        expImg[1:-1,1:-1] = img
-        # Fill borders of expanded image with borders of original image
-        # (except angular pixels)
-        expImg[1:-1,0] = img[...,0]
-        expImg[1:-1,-1] = img[...,-1]
-        expImg[0,1:-1] = img[0,...]
-        expImg[-1,1:-1] = img[-1,...]
-        # Fill angular pixels
-        expImg[0,0] = img[0,0]
-        expImg[0,-1] = img[0,-1]
-        expImg[-1,0] = img[-1,0]
-        expImg[-1,-1] = img[-1,-1]
-
-        return expImg
+        self._padded.reverse()
+        self.inImg = self._padded[0].image
+
+        return self.inImg
+
+    def _correlate(self, expImg, name):
+        """
+        Correlation of expanded image with registered kernel (result is divided by divisor of kernel),
+        result becomes current image
+
+        :param expImg: Image with border around it
+        :type  expImg: numpy
+        :param name:   Name of kernel
+        :type  name:   str
+        :return:       Result image
+        :rtype:        numpy
+        """
+        return kernels.correlateRegistered(expImg, name, self._nextImage(),
+            scratch=self._scratch, tmp=self._tmp[:, :expImg.shape[1]])
 
+    @cache.cachedStep
     def gaussSmoothing(self):
         """
         Gauss smoothing operator with 3x3 square
@@ -85,33 +123,149 @@ class EdgeStrength:
         # Expand image with border around it
         expImg = self._expandImage()
 
-        self.inImg = (expImg[0:-2,0:-2] + 2*expImg[0:-2,1:-1] + expImg[0:-2,2:] + 
-            2*expImg[1:-1,0:-2] + 4*expImg[1:-1,1:-1] + 2*expImg[1:-1,2:] + 
-            expImg[2:,0:-2] + 2*expImg[2:,1:-1] + expImg[2:,2:]) / 16
+        self._correlate(expImg, "gauss3")
 
+    @cache.cachedStep
     def gaussSmoothingTwice(self):
         """
         Gauss smoothing operator with 5x5 square
         """
-        # Expand image with border around it
-        expImg = self._expandImage(self._expandImage())
+        # Expand image with double border around it
+        expImg = self._expandImage(2)
+
+        self._correlate(expImg, "gauss5")
+
+    @cache.cachedStep
+    def gaussFilter(self, sigma):
+        """
+        Gauss smoothing with any standard deviation, computed in float32.
+        Small sigma uses separable sampled kernel, large one recursive filter
+
+        :param sigma: Standard deviation
+        :type  sigma: float
+        """
+        resImg = self._float32Image()
+        gaussian.gaussFilter(resImg, sigma, resImg, self._gaussBuffers[1:3])
+        self._nextImage()[...] = resImg
+
+    @cache.cachedStep
+    def boxFilter(self, radius):
+        """
+        Mean filter with (2 radius + 1) x (2 radius + 1) square computed from summed-area table,
+        so its cost does not depend on radius (square is clamped to image near borders)
+
+        :param radius: Radius of square (or radius of rows and of columns)
+        :type  radius: int or tuple
+        """
+        self._summedAreaTable().mean(radius, self._nextImage())
+
+    @cache.cachedStep
+    def boxGaussSmoothing(self, sigma, passes = 3):
+        """
+        Approximation of Gauss smoothing with repeated mean filters (cost does not depend on sigma)
+
+        :param sigma:  Standard deviation
+        :type  sigma:  float
+        :param passes: Amount of mean filter passes
+        :type  passes: int
+        """
+        for radius in integral.boxRadii(sigma, passes):
+            self._summedAreaTable().mean(radius, self._nextImage())
+
+    def localStatistics(self, radius):
+        """
+        Getting local mean and variance of current image in (2 radius + 1) x (2 radius + 1)
+        square of every pixel from summed-area tables (for adaptive thresholds)
+
+        :param radius: Radius of square (or radius of rows and of columns)
+        :type  radius: int or tuple
+        :return:       Mean and variance maps
+        :rtype:        numpy, numpy
+        """
+        # Work in padded buffer
+        self._expandImage(0)
 
-        self.inImg = (expImg[0:-4,0:-4] + 2*expImg[0:-4,1:-3] + 4*expImg[0:-4,2:-2] + 2*expImg[0:-4,3:-1] + expImg[0:-4,4:] +
-            2*expImg[1:-3,0:-4] + 4*expImg[1:-3,1:-3] + 8*expImg[1:-3,2:-2] + 4*expImg[1:-3,3:-1] + 2*expImg[1:-3,4:] +
-            4*expImg[2:-2,0:-4] + 8*expImg[2:-2,1:-3] + 16*expImg[2:-2,2:-2] + 8*expImg[2:-2,3:-1] + 4*expImg[2:-2,4:] +
-            2*expImg[3:-1,0:-4] + 4*expImg[3:-1,1:-3] + 8*expImg[3:-1,2:-2] + 4*expImg[3:-1,3:-1] + 2*expImg[3:-1,4:] +
-            expImg[4:,0:-4] + 2*expImg[4:,1:-3] + 4*expImg[4:,2:-2] + 2*expImg[4:,3:-1] + expImg[4:,4:]) / 100
+        return integral.SummedAreaTable(self.inImg, squares=True).meanVariance(radius)
 
-    def laplacianEdges(self, coef):
+    def _summedAreaTable(self):
+        """
+        Creating summed-area table of current image in preallocated array
+
+        :rtype: integral.SummedAreaTable
+        """
+        # Work in padded buffer
+        self._expandImage(0)
+        if self._table is None:
+            self._table = np.empty((self.height + 1, self.width + 1))
+
+        return integral.SummedAreaTable(self.inImg, out=self._table)
+
+    def _float32Image(self):
+        """
+        Copying current image to the first float32 buffer (buffers are created with the first use)
+
+        :return: Copy of image
+        :rtype:  numpy
+        """
+        # Work in padded buffer
+        self._expandImage(0)
+        if self._gaussBuffers is None:
+            self._gaussBuffers = [np.empty((self.height, self.width), dtype=np.float32) for _ in range(4)]
+        self._gaussBuffers[0][...] = self.inImg
+
+        return self._gaussBuffers[0]
+
+    def _gaussLevel(self, sigma):
+        """
+        Getting current image smoothed with Gauss filter. Levels are kept only while content
+        of current image is the same as their source (at most GAUSS_LEVELS of them,
+        the oldest one is dropped at first)
+
+        :param sigma: Standard deviation
+        :type  sigma: float
+        :return:      Smoothed image (float32)
+        :rtype:       numpy
+        """
+        # Work in padded buffer
+        self._expandImage(0)
+        # Levels of other image are dropped
+        if self._levelsImg is None:
+            self._levelsImg = np.empty_like(self.inImg)
+        elif not np.array_equal(self._levelsImg, self.inImg):
+            self._gaussLevels = {}
+        if not self._gaussLevels:
+            self._levelsImg[...] = self.inImg
+        if sigma not in self._gaussLevels:
+            if len(self._gaussLevels) >= GAUSS_LEVELS:
+                del self._gaussLevels[next(iter(self._gaussLevels))]
+            self._gaussLevels[sigma] = gaussian.gaussFilter(self.inImg, sigma)
+
+        return self._gaussLevels[sigma]
+
+    def laplacianEdges(self, coef, operator = "laplacian", sigma = 1.0):
         """
         Use Laplacian operator to find edges of image and lower Laplacian shade range to 0 - coef
 
-        :param coef: Maximum value of Laplacian shades
-        :type  coef: float
+        :param coef:     Maximum value of Laplacian shades
+        :type  coef:     float
+        :param operator: "laplacian" (3x3 operator), "log" (Laplacian of Gaussian) or "dog"
+                         (difference of Gaussians with sigma and DOG_RATIO * sigma), all of them
+                         work on current image (as nodes of Pipeline)
+        :type  operator: str
+        :param sigma:    Standard deviation of Gauss filter of "log" and "dog"
+        :type  sigma:    float
         """
-        self._laplacian()
+        if operator == "laplacian":
+            self._laplacian()
+        elif operator == "log":
+            self._logFilter(sigma)
+        elif operator == "dog":
+            self._dogFilter(sigma)
+        else:
+            raise ValueError('Undefined operator: {}. Available operators: "laplacian", "log" or "dog"'.format(operator))
         self._lsLaplacian(coef)
 
+    @cache.cachedStep
     def _laplacian(self):
         """
         Getting second-order derivative approximations with using of Laplacian operator
@@ -119,9 +273,33 @@ class EdgeStrength:
         # Expand image with border around it
         expImg = self._expandImage()
 
-        self.inImg = - expImg[0:-2,0:-2] - expImg[0:-2,1:-1] - expImg[0:-2,2:] - expImg[1:-1,0:-2] + 8*expImg[1:-1,1:-1] - expImg[1:-1,2:] - expImg[2:,0:-2] - expImg[2:,1:-1] - expImg[2:,2:]
+        self._correlate(expImg, "laplacian")
+
+    @cache.cachedStep
+    def _logFilter(self, sigma):
+        """
+        Getting negative Laplacian of smoothed image with one Laplacian of Gaussian operator
+
+        :param sigma: Standard deviation of Gauss filter
+        :type  sigma: float
+        """
+        resImg = self._float32Image()
+        gaussian.logFilter(resImg, sigma, resImg, self._gaussBuffers[1:])
+        self._nextImage()[...] = resImg
+
+    @cache.cachedStep
+    def _dogFilter(self, sigma):
+        """
+        Getting difference of Gaussians of current image (approximation of negative Laplacian
+        of smoothed image), smoothed images are kept for next calls on the same image
+
+        :param sigma: Standard deviation of the smaller Gauss filter
+        :type  sigma: float
+        """
+        np.subtract(self._gaussLevel(sigma), self._gaussLevel(DOG_RATIO * sigma), out=self._nextImage())
 
     # def _lsLaplacian(self, coef = np.finfo(np.float64).max / 32786):
+    @cache.keyedStep
     def _lsLaplacian(self, coef = 1024):
         """
         Lower Laplacian shade range to 0 - coef
@@ -129,47 +307,83 @@ class EdgeStrength:
         :param coef: Maximum value of Laplacian shades
         :type  coef: float
         """
-        self.inImg[self.inImg < 0] = 0
-        self._linearStretching(coef)
-        self.inImg[...] += 1
+        # Work in padded buffer
+        self._expandImage(0)
+        applySteps(self.inImg, lsLaplacianSteps(coef))
 
+    @cache.keyedStep
     def _linearStretching(self, coef):
         """
         Performing linear stretching on greyscale image
         """
-        # Get bounds of shades
-        a = np.amin(self.inImg)
-        b = np.amax(self.inImg)
-        # print(b)
+        # Work in padded buffer
+        self._expandImage(0)
+        # Linear stretching to 0 - coef (in place)
+        applySteps(self.inImg, (("stretch", 0, coef),))
+
+    @cache.keyedStep
+    def strengtheningEdges(self, operator = None, sigma = 1.0, coef = 0.7):
+        """
+        Strengthening edges on greyscale image. Without operator current image contains shades
+        of edges, otherwise edges are found at first (see laplacianEdges())
+
+        :param operator: None, "laplacian", "log" or "dog"
+        :type  operator: str
+        :param sigma:    Standard deviation of Gauss filter of "log" and "dog"
+        :type  sigma:    float
+        :param coef:     Maximum value of Laplacian shades found by operator
+        :type  coef:     float
+        """
+        if operator is not None:
+            self.laplacianEdges(coef, operator, sigma)
+        # Work in padded buffer
+        self._expandImage(0)
+        applySteps(self.inImg, STRENGTHEN_STEPS, (self.inImg, self.origImg))
 
-        # Set bounds of new shades
-        c = 0
-        d = coef
+    @staticmethod
+    def _keyKernels(name, args):
+        """
+        Kernels of cached operation
 
-        # Linear stretching
-        resImg = np.zeros((self.height, self.width))
-        resImg[...] = (self.inImg[...] - a) * ((d - c) / (b - a)) + c
+        :param name: Name of operation
+        :type  name: str
+        :param args: All arguments of operation
+        :type  args: tuple
+        :return:     Coefficients and divisors of kernels
+        :rtype:      list
+        """
+        if name not in STEP_KERNELS:
+            return []
 
-        # Update image
-        self.inImg = resImg
+        return [kernels.getKernel(STEP_KERNELS[name]), kernels.getDivisor(STEP_KERNELS[name])]
 
-    def strengtheningEdges(self):
+    def _loadCached(self, img):
         """
-        Strengthening edges on greyscale image
+        Making cached result of operation current image
+
+        :param img: Result image
+        :type  img: numpy
         """
-        self.inImg[...] = self.inImg[...] * self.origImg[...]
+        self._nextImage()[...] = img
 
-    def saveImage(self, path):
+    def saveImage(self, path, writer = None):
         """
         Saving image to file
 
-        :param path: Save path
-        :type  path: str
+        :param path:   Save path
+        :type  path:   str
+        :param writer: Writer saving image in background (image is saved at once by default)
+        :type  writer: ImageWriter
         """
-        cv.imwrite(path, self.inImg)
+        if writer is not None:
+            writer.write(path, self.inImg)
+        else:
+            cv.imwrite(path, self.inImg)
 
     def restoreImage(self):
         """
-        Restoring original greyscale image and shade map from backup
+        Restoring original greyscale image from backup
         """
-        self.inImg = self.origImg
\ No newline at end of file
+        self._padded[0].load(self.origImg)
+        self.inImg = self._padded[0].image
+        self._key, self._keyImg = cache.imageKey(self.origImg), self.inImg
\ No newline at end of file
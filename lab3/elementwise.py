@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+# Steps multiplying shades of edges with original image (the second image of steps)
+STRENGTHEN_STEPS = (("multiply", 1),)
+
+def lsLaplacianSteps(coef = 1024):
+    """
+    Steps lowering Laplacian shade range to 1 - coef + 1
+
+    :param coef: Maximum value of Laplacian shades
+    :type  coef: float
+    :return:     Clipping, linear stretching and adding of 1
+    :rtype:      tuple
+    """
+    return (("clip", 0), ("stretch", 0, coef), ("affine", 1, 1))
+
+def applySteps(img, steps, images = ()):
+    """
+    Applying elementwise steps to image in place. Range of shades is followed through
+    the steps, so stretching after clipping and linear steps does not search for it again,
+    and consecutive linear steps are one multiplication and addition
+
+    Steps are ("clip", low), ("stretch", low, high), ("affine", scale, offset),
+    ("multiply", index) and ("subtract", index), index is position of other image in images
+
+    :param img:    Image (float64), it is overwritten by result
+    :type  img:    numpy
+    :param steps:  Steps with their parameters
+    :type  steps:  tuple
+    :param images: Images used by steps (the first one is input of steps)
+    :type  images: tuple
+    :return:       Result image
+    :rtype:        numpy
+    """
+    # Range of current shades (None if unknown) and linear step not applied yet
+    bounds = None
+    scale, offset = 1.0, 0.0
+
+    def flush():
+        if scale != 1:
+            np.multiply(img, scale, out=img)
+        if offset != 0:
+            np.add(img, offset, out=img)
+        return 1.0, 0.0
+
+    for step in steps:
+        if step[0] == "clip":
+            scale, offset = flush()
+            np.maximum(img, step[1], out=img)
+            if bounds is not None:
+                bounds = (max(bounds[0], step[1]), max(bounds[1], step[1]))
+        elif step[0] == "stretch":
+            if bounds is None:
+                scale, offset = flush()
+                bounds = (np.amin(img), np.amax(img))
+            a, b = bounds
+            c, d = step[1], step[2]
+            # Compose with linear step not applied yet
+            factor = (d - c) / (b - a)
+            scale, offset = scale * factor, (offset - a) * factor + c
+            bounds = (c, d)
+        elif step[0] == "affine":
+            scale, offset = scale * step[1], offset * step[1] + step[2]
+            if bounds is not None:
+                bounds = tuple(sorted(bound * step[1] + step[2] for bound in bounds))
+        elif step[0] in ("multiply", "subtract"):
+            scale, offset = flush()
+            if step[0] == "multiply":
+                np.multiply(img, images[step[1]], out=img)
+            else:
+                np.subtract(img, images[step[1]], out=img)
+            bounds = None
+        else:
+            raise ValueError('Undefined step: {}. Available steps: "clip", "stretch", "affine", "multiply" or "subtract"'.format(step[0]))
+    flush()
+
+    return img
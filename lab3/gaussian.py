@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+# The largest sigma filtered with sampled kernel (radius 9), larger ones use recursive filter
+# (its cost does not depend on sigma)
+RECURSIVE_SIGMA = 3.0
+
+def gaussKernel(sigma):
+    """
+    Creating normalized half of sampled 1-D Gauss kernel with radius 3 sigma
+
+    :param sigma: Standard deviation
+    :type  sigma: float
+    :return:      Weights of center and of pixels at distance 1 - radius
+    :rtype:       numpy
+    """
+    radius = max(1, int(np.ceil(3 * sigma)))
+    weights = np.exp(-0.5 * (np.arange(radius + 1) / sigma) ** 2)
+
+    return weights / (2 * weights.sum() - weights[0])
+
+def _coefficients(q):
+    """
+    Coefficients of recursive Gauss filter for its parameter q (Young and van Vliet, 1995)
+
+    :param q: Parameter of filter
+    :type  q: float
+    :return:  Gain of input pixel and weights of three previous results
+    :rtype:   float, tuple
+    """
+    b0 = 1.57825 + 2.44413 * q + 1.4281 * q ** 2 + 0.422205 * q ** 3
+    b1 = 2.44413 * q + 2.85619 * q ** 2 + 1.26661 * q ** 3
+    b2 = -(1.4281 * q ** 2 + 1.26661 * q ** 3)
+    b3 = 0.422205 * q ** 3
+
+    return 1 - (b1 + b2 + b3) / b0, (b1 / b0, b2 / b0, b3 / b0)
+
+def _variance(gain, weights):
+    """
+    Variance of impulse response of causal and anti-causal recursive filters together
+
+    :param gain:    Gain of input pixel
+    :type  gain:    float
+    :param weights: Weights of three previous results
+    :type  weights: tuple
+    :rtype:         float
+    """
+    mean = sum(k * b for k, b in enumerate(weights, 1)) / gain
+    return 2 * (sum(k * k * b for k, b in enumerate(weights, 1)) / gain + mean ** 2)
+
+def logKernel(sigma):
+    """
+    Creating half of sampled 1-D second derivative of Gauss kernel with opposite sign.
+    Its coefficients sum to zero, so flat image gives zero response
+
+    :param sigma: Standard deviation
+    :type  sigma: float
+    :return:      Weights of center and of pixels at distance 1 - radius
+    :rtype:       numpy
+    """
+    radius = max(1, int(np.ceil(3 * sigma)))
+    x = np.arange(radius + 1)
+    weights = (1 - (x / sigma) ** 2) / sigma ** 2 * np.exp(-0.5 * (x / sigma) ** 2)
+    weights /= np.sqrt(2 * np.pi) * sigma
+    # Move sum of whole kernel to zero
+    weights -= (2 * weights.sum() - weights[0]) / (2 * radius + 1)
+
+    return weights
+
+def recursiveCoefficients(sigma):
+    """
+    Finding coefficients of recursive Gauss filter (Young and van Vliet, 1995).
+    Parameter q of filter is found by bisection, so variance of its impulse response
+    is exactly sigma squared (formula of the paper makes it about 20 % wider)
+
+    :param sigma: Standard deviation (not less than 0.5)
+    :type  sigma: float
+    :return:      Gain of input pixel and weights of three previous results
+    :rtype:       float, tuple
+    """
+    # Variance grows with q, the paper's formula is start of upper bound
+    low, high = 0.0, max(0.98711 * sigma - 0.96330, 1.0)
+    while _variance(*_coefficients(high)) < sigma ** 2:
+        high *= 2
+    for _ in range(60):
+        q = (low + high) / 2
+        if _variance(*_coefficients(q)) < sigma ** 2:
+            low = q
+        else:
+            high = q
+
+    return _coefficients((low + high) / 2)
+
+def _sampledPass(src, weights, out, scratch):
+    """
+    Filtering columns of image with symmetric kernel (pixels out of image repeat border rows)
+
+    :param src:     Image
+    :type  src:     numpy
+    :param weights: Weights of center and of pixels at distance 1 - radius
+    :type  weights: numpy
+    :param out:     Result array
+    :type  out:     numpy
+    :param scratch: Array of image size for weighted terms
+    :type  scratch: numpy
+    """
+    np.multiply(src, weights[0], out=out)
+    for k in range(1, len(weights)):
+        # Pixels above
+        np.multiply(src[:-k], weights[k], out=scratch[k:])
+        np.multiply(src[0], weights[k], out=scratch[:k])
+        out += scratch
+        # Pixels below
+        np.multiply(src[k:], weights[k], out=scratch[:-k])
+        np.multiply(src[-1], weights[k], out=scratch[-k:])
+        out += scratch
+
+def _boundaryMatrix(weights):
+    """
+    Matrix of anti-causal filter start for repeated last pixel (Triggs and Sdika, 2006).
+    It maps differences of the last three causal results from last pixel to differences
+    of anti-causal results of the last pixel and of two pixels after it (filter with gain 1)
+
+    :param weights: Weights of three previous results
+    :type  weights: tuple
+    :rtype:         numpy
+    """
+    a1, a2, a3 = weights
+    scale = 1 / ((1 + a1 - a2 + a3) * (1 - a1 - a2 - a3) * (1 + a2 + (a1 - a3) * a3))
+
+    return scale * np.array([
+        [1 - a2 - a1 * a3 - a3 ** 2, (a1 + a3) * (a2 + a1 * a3), a3 * (a1 + a2 * a3)],
+        [a1 + a2 * a3, (1 - a2) * (a2 + a1 * a3), a3 * (1 - a2 - a1 * a3 - a3 ** 2)],
+        [a2 + a1 ** 2 + a1 * a3 - a2 ** 2, a3 + a1 * a2 - a2 * a3 + a2 ** 2 * a3 - a1 * a3 ** 2 - a3 ** 3, a3 * (a1 + a2 * a3)]])
+
+def _recursivePass(src, gain, weights, out):
+    """
+    Filtering columns of image with causal and anti-causal recursive filters
+    (pixels out of image repeat border rows)
+
+    :param src:     Image
+    :type  src:     numpy
+    :param gain:    Gain of input pixel
+    :type  gain:    float
+    :param weights: Weights of three previous results
+    :type  weights: tuple
+    :param out:     Result array (can be src)
+    :type  out:     numpy
+    """
+    b1, b2, b3 = weights
+    height = src.shape[0]
+    row = np.empty(src.shape[1:], dtype=out.dtype)
+    # Border rows (src can be overwritten by causal pass)
+    first, last = src[0].copy(), src[height - 1].copy()
+
+    # Causal pass from the first row (result before image equals border row)
+    prev = [first] * 3
+    for n in range(height):
+        np.multiply(src[n], gain, out=row)
+        row += b1 * prev[0]
+        row += b2 * prev[1]
+        row += b3 * prev[2]
+        out[n] = row
+        prev = [out[n], prev[0], prev[1]]
+
+    # Anti-causal pass from the last row. Results of the last row and after it are
+    # steady state of both filters for repeated last row plus response to difference
+    # of the last causal results from it
+    causal = [(out[n] if n >= 0 else first) - last for n in range(height - 1, height - 4, -1)]
+    matrix = gain * _boundaryMatrix(weights)
+    prev = [last + sum(matrix[i, j] * causal[j] for j in range(3)) for i in range(3)]
+    out[height - 1] = prev[0]
+    for n in range(height - 2, -1, -1):
+        np.multiply(out[n], gain, out=row)
+        row += b1 * prev[0]
+        row += b2 * prev[1]
+        row += b3 * prev[2]
+        out[n] = row
+        prev = [out[n], prev[0], prev[1]]
+
+def _laplacianPass(src, out):
+    """
+    Negative Laplacian with 5-point stencil (pixels out of image repeat border pixels)
+
+    :param src: Image
+    :type  src: numpy
+    :param out: Result array (not src)
+    :type  out: numpy
+    """
+    np.multiply(src, 4, out=out)
+    out[1:] -= src[:-1]
+    out[0] -= src[0]
+    out[:-1] -= src[1:]
+    out[-1] -= src[-1]
+    out[:, 1:] -= src[:, :-1]
+    out[:, 0] -= src[:, 0]
+    out[:, :-1] -= src[:, 1:]
+    out[:, -1] -= src[:, -1]
+
+def gaussFilter(img, sigma, out = None, tmp = None, dtype = np.float32):
+    """
+    Gauss smoothing with any standard deviation. Sampled kernel is used in separable passes
+    for small sigma, recursive filter for large one, so cost of pixel is limited for all sigmas
+
+    :param img:   Greyscale image
+    :type  img:   numpy
+    :param sigma: Standard deviation (positive)
+    :type  sigma: float
+    :param out:   Result array (image size, it can be img)
+    :type  out:   numpy
+    :param tmp:   Two arrays of image size (the second one is used only by sampled kernel)
+    :type  tmp:   tuple
+    :param dtype: Data type of created arrays
+    :type  dtype: numpy.dtype
+    :return:      Smoothed image
+    :rtype:       numpy
+    """
+    if sigma <= 0:
+        raise ValueError("Sigma must be positive: {}".format(sigma))
+    if out is None:
+        out = np.empty(img.shape, dtype=dtype)
+    if tmp is None:
+        tmp = (np.empty(img.shape, dtype=out.dtype), np.empty(img.shape, dtype=out.dtype))
+
+    if sigma <= RECURSIVE_SIGMA:
+        weights = gaussKernel(sigma).astype(out.dtype)
+        # Vertical pass, then horizontal pass over transposed views
+        _sampledPass(img, weights, tmp[0], tmp[1])
+        _sampledPass(tmp[0].T, weights, out.T, tmp[1].T)
+    else:
+        gain, weights = recursiveCoefficients(sigma)
+        # Vertical pass, horizontal pass runs over rows of transposed copy
+        _recursivePass(img, gain, weights, out)
+        transposed = tmp[0].reshape(img.shape[::-1])
+        transposed[...] = out.T
+        _recursivePass(transposed, gain, weights, transposed)
+        out[...] = transposed.T
+
+    return out
+
+def logFilter(img, sigma, out = None, tmp = None, dtype = np.float32):
+    """
+    Laplacian of Gaussian (with opposite sign, edges are positive on brighter side) in one operator.
+    Small sigma uses sum of two separable sampled kernels (four 1-D passes),
+    large one recursive Gauss filter and 5-point Laplacian
+
+    :param img:   Greyscale image
+    :type  img:   numpy
+    :param sigma: Standard deviation
+    :type  sigma: float
+    :param out:   Result array (image size, it can be img)
+    :type  out:   numpy
+    :param tmp:   Three arrays of image size
+    :type  tmp:   tuple
+    :param dtype: Data type of created arrays
+    :type  dtype: numpy.dtype
+    :return:      Negative Laplacian of smoothed image
+    :rtype:       numpy
+    """
+    if sigma <= 0:
+        raise ValueError("Sigma must be positive: {}".format(sigma))
+    if out is None:
+        out = np.empty(img.shape, dtype=dtype)
+    if tmp is None:
+        tmp = tuple(np.empty(img.shape, dtype=out.dtype) for _ in range(3))
+    smoothed, derived, scratch = tmp
+
+    if sigma <= RECURSIVE_SIGMA:
+        gauss = gaussKernel(sigma).astype(out.dtype)
+        log = logKernel(sigma).astype(out.dtype)
+        # Vertical passes of both kernels (image is not needed after them)
+        _sampledPass(img, gauss, smoothed, scratch)
+        _sampledPass(img, log, derived, scratch)
+        # Horizontal passes of the other kernel, summed in result
+        _sampledPass(smoothed.T, log, out.T, scratch.T)
+        _sampledPass(derived.T, gauss, smoothed.T, scratch.T)
+        out += smoothed
+    else:
+        gaussFilter(img, sigma, smoothed, (derived, scratch))
+        _laplacianPass(smoothed, out)
+
+    return out
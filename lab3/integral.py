@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+class SummedAreaTable:
+    """
+    Summed-area table of image: every entry is sum of pixels above and to the left of it,
+    so sum of any rectangle costs four lookups. Windows near borders are clamped to image
+    (only pixels inside of image are summed and counted)
+
+    :ivar    height:  Height of image
+    :vartype height:  int
+    :ivar    width:   Width of image
+    :vartype width:   int
+    :ivar    sums:    Table of pixels (one row and column more than image, int64 for integer
+                      image, float64 otherwise)
+    :vartype sums:    numpy
+    :ivar    squares: Table of squared pixels (None if it was not requested)
+    :vartype squares: numpy
+    """
+    def __init__(self, img, squares = False, out = None):
+        """
+        :param img:     Greyscale image
+        :type  img:     numpy
+        :param squares: Create table of squared pixels for variance too
+        :type  squares: bool
+        :param out:     Array for table of pixels ((height + 1) x (width + 1))
+        :type  out:     numpy
+        """
+        # Rows
+        self.height = img.shape[0]
+        # Columns
+        self.width = img.shape[1]
+        dtype = np.int64 if np.issubdtype(img.dtype, np.integer) else np.float64
+        self.sums = self._table(img, dtype, out)
+        self.squares = self._table(np.square(img, dtype=dtype), dtype) if squares else None
+
+    @staticmethod
+    def _table(img, dtype, out = None):
+        """
+        Creating summed-area table with zero first row and column
+
+        :param img:   Image
+        :type  img:   numpy
+        :param dtype: Data type of table
+        :type  dtype: numpy.dtype
+        :param out:   Array for table
+        :type  out:   numpy
+        :return:      Table
+        :rtype:       numpy
+        """
+        if out is None:
+            out = np.empty((img.shape[0] + 1, img.shape[1] + 1), dtype=dtype)
+        out[0] = 0
+        out[:, 0] = 0
+        # Sums of columns, then sums of rows of them
+        np.cumsum(img, axis=0, dtype=out.dtype, out=out[1:, 1:])
+        np.cumsum(out[1:, 1:], axis=1, out=out[1:, 1:])
+
+        return out
+
+    @staticmethod
+    def _radii(radius):
+        """
+        Radius of rows and radius of columns of window
+
+        :param radius: Radius of window (or radius of rows and of columns)
+        :type  radius: int or tuple
+        :rtype:        int, int
+        """
+        return (radius, radius) if np.isscalar(radius) else radius
+
+    @staticmethod
+    def _differences(table, radius, out):
+        """
+        Differences of bottom and top rows of window of every row (window is clamped to table,
+        top row of table is zero, so clamped top rows are not subtracted)
+
+        :param table:  Table or its transposed view
+        :type  table:  numpy
+        :param radius: Radius of window
+        :type  radius: int
+        :param out:    Result array (one row less than table)
+        :type  out:    numpy
+        """
+        height = out.shape[0]
+        # Rows with bottom row of window inside of table, the last row for the others
+        inside = max(0, height - radius)
+        out[:inside] = table[radius + 1:radius + 1 + inside]
+        out[inside:] = table[height]
+        if radius < height:
+            out[radius:] -= table[:height - radius]
+
+    def _windowSums(self, table, radius, out):
+        """
+        Summing window of every pixel with four lookups in table
+
+        :param table:  Summed-area table
+        :type  table:  numpy
+        :param radius: Radius of window
+        :type  radius: int or tuple
+        :param out:    Result array (image size)
+        :type  out:    numpy
+        :return:       Sums of windows
+        :rtype:        numpy
+        """
+        rowRadius, colRadius = self._radii(radius)
+        # Differences of rows, then differences of their columns
+        rows = np.empty((self.height, self.width + 1), dtype=table.dtype)
+        self._differences(table, rowRadius, rows)
+        self._differences(rows.T, colRadius, out.T)
+
+        return out
+
+    def _divideByCounts(self, radius, out):
+        """
+        Dividing window sums by amount of image pixels in window of every pixel
+
+        :param radius: Radius of window
+        :type  radius: int or tuple
+        :param out:    Sums of windows (float)
+        :type  out:    numpy
+        """
+        rowRadius, colRadius = self._radii(radius)
+        rows = np.arange(self.height)
+        cols = np.arange(self.width)
+        rowCounts = np.minimum(rows + rowRadius + 1, self.height) - np.maximum(rows - rowRadius, 0)
+        colCounts = np.minimum(cols + colRadius + 1, self.width) - np.maximum(cols - colRadius, 0)
+        out /= rowCounts[:, None]
+        out /= colCounts
+
+    def boxSum(self, radius, out = None):
+        """
+        Box filter: sum of (2 radius + 1) x (2 radius + 1) window of every pixel
+        (cost does not depend on radius)
+
+        :param radius: Radius of window (or radius of rows and of columns)
+        :type  radius: int or tuple
+        :param out:    Result array (image size)
+        :type  out:    numpy
+        :return:       Sums of windows
+        :rtype:        numpy
+        """
+        if out is None:
+            out = np.empty((self.height, self.width), dtype=self.sums.dtype)
+
+        return self._windowSums(self.sums, radius, out)
+
+    def mean(self, radius, out = None):
+        """
+        Mean filter: mean of (2 radius + 1) x (2 radius + 1) window of every pixel
+        (cost does not depend on radius)
+
+        :param radius: Radius of window (or radius of rows and of columns)
+        :type  radius: int or tuple
+        :param out:    Result array (image size)
+        :type  out:    numpy
+        :return:       Means of windows
+        :rtype:        numpy
+        """
+        if out is None:
+            out = np.empty((self.height, self.width))
+        self._windowSums(self.sums, radius, out)
+        self._divideByCounts(radius, out)
+
+        return out
+
+    def meanVariance(self, radius):
+        """
+        Local mean and variance of (2 radius + 1) x (2 radius + 1) window of every pixel
+        (table of squared pixels is needed)
+
+        :param radius: Radius of window (or radius of rows and of columns)
+        :type  radius: int or tuple
+        :return:       Means and variances of windows
+        :rtype:        numpy, numpy
+        """
+        if self.squares is None:
+            raise ValueError("Table of squared pixels is needed for variance")
+
+        mean = self._windowSums(self.sums, radius, np.empty((self.height, self.width)))
+        self._divideByCounts(radius, mean)
+        variance = self._windowSums(self.squares, radius, np.empty((self.height, self.width)))
+        self._divideByCounts(radius, variance)
+        # Mean of squares minus squared mean (rounding errors can make it slightly negative)
+        variance -= np.square(mean)
+        np.maximum(variance, 0, out=variance)
+
+        return mean, variance
+
+def boxRadii(sigma, passes = 3):
+    """
+    Finding radii of box filters whose repeated passes approximate Gauss filter
+    (two neighbouring odd widths, sum of variances of passes is the nearest to sigma squared)
+
+    :param sigma:  Standard deviation
+    :type  sigma:  float
+    :param passes: Amount of box filter passes
+    :type  passes: int
+    :return:       Radius of every pass
+    :rtype:        list
+    """
+    # Box of width w has variance (w^2 - 1) / 12
+    ideal = np.sqrt(12 * sigma ** 2 / passes + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    # Amount of passes with the smaller width giving the nearest sum of variances
+    variances = [(m * (lower ** 2 - 1) + (passes - m) * ((lower + 2) ** 2 - 1)) / 12 for m in range(passes + 1)]
+    smaller = int(np.argmin(np.absolute(np.array(variances) - sigma ** 2)))
+
+    return [(lower - 1) // 2 if i < smaller else (lower + 1) // 2 for i in range(passes)]
+
+def boxGaussFilter(img, sigma, passes = 3, out = None, table = None):
+    """
+    Approximation of Gauss smoothing with repeated mean filters (cost does not depend on sigma)
+
+    :param img:    Greyscale image
+    :type  img:    numpy
+    :param sigma:  Standard deviation
+    :type  sigma:  float
+    :param passes: Amount of mean filter passes
+    :type  passes: int
+    :param out:    Result array (image size, it can be img)
+    :type  out:    numpy
+    :param table:  Array for summed-area table ((height + 1) x (width + 1), float64)
+    :type  table:  numpy
+    :return:       Smoothed image
+    :rtype:        numpy
+    """
+    if out is None:
+        out = np.empty(img.shape)
+    if table is None:
+        table = np.empty((img.shape[0] + 1, img.shape[1] + 1))
+
+    resImg = img
+    for radius in boxRadii(sigma, passes):
+        SummedAreaTable(resImg, out=table).mean(radius, out)
+        resImg = out
+
+    return out
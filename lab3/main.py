@@ -1,12 +1,20 @@
 #!/usr/bin/env python
 
-from edgestrength import EdgeStrength
 import os, sys
 
+# Modules shared by labs are in common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common"))
+
+from edgestrength import EdgeStrength
+from imagewriter import ImageWriter
+
 # Create output directory
 dirname = "out"
 if not os.path.exists(dirname): os.mkdir(dirname)
 
+# Images are encoded in background while next ones are processed
+writer = ImageWriter()
+
 # Load image
 if len(sys.argv) > 1:
 	img = EdgeStrength(sys.argv[1])
@@ -17,39 +25,42 @@ else:
 imgName  = [dirname + "/{}.png".format(i) for i in ["1_grey", "2_lap", "3_gauss3", "4_lap3", "5_res3", "6_gauss5", "7_lap5", "8_res5"]]
 
 # Save greyscale image
-img.saveImage(imgName[0])
+img.saveImage(imgName[0], writer)
 
 # Laplacian without smoothing
 img._laplacian()
 img._lsLaplacian()
-img.saveImage(imgName[1])
+img.saveImage(imgName[1], writer)
 img.restoreImage()
 
 # Gauss smoothing 3x3
 img.gaussSmoothing()
-img.saveImage(imgName[2])
+img.saveImage(imgName[2], writer)
 
 # Laplacian with smoothing 3x3
 img._laplacian()
 img._lsLaplacian()
-img.saveImage(imgName[3])
+img.saveImage(imgName[3], writer)
 
 # Result with 3x3
 img._lsLaplacian(0.7)
 img.strengtheningEdges()
-img.saveImage(imgName[4])
+img.saveImage(imgName[4], writer)
 img.restoreImage()
 
 # Gauss smoothing 5x5
 img.gaussSmoothingTwice()
-img.saveImage(imgName[5])
+img.saveImage(imgName[5], writer)
 
 # Laplacian with smoothing 5x5
 img._laplacian()
 img._lsLaplacian()
-img.saveImage(imgName[6])
+img.saveImage(imgName[6], writer)
 
 # Result with 5x5
 img._lsLaplacian(0.7)
 img.strengtheningEdges()
-img.saveImage(imgName[7])
\ No newline at end of file
+img.saveImage(imgName[7], writer)
+
+# Wait until all images are saved
+writer.close()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+
+import cache
+import gaussian
+import kernels
+import numpy as np
+from edgestrength import DOG_RATIO
+from elementwise import STRENGTHEN_STEPS, applySteps, lsLaplacianSteps
+from padding import PaddedImage
+
+class Node:
+    """
+    Lazy operation of pipeline. Methods only create next operations, images are computed
+    by Pipeline.evaluate(). The same operation of the same inputs is always the same node
+
+    :ivar    pipeline: Pipeline of node
+    :vartype pipeline: Pipeline
+    :ivar    op:       Operation ("source", "correlate", "gauss", "log" or "map")
+    :vartype op:       str
+    :ivar    inputs:   Input nodes (the first one is transformed by "map" steps)
+    :vartype inputs:   tuple
+    :ivar    params:   Parameters of operation (kernel, sigma or elementwise steps)
+    :vartype params:   object
+    """
+    def __init__(self, pipeline, op, inputs, params):
+        self.pipeline = pipeline
+        self.op = op
+        self.inputs = inputs
+        self.params = params
+
+    def smooth(self, size = 3):
+        """
+        Gauss smoothing operator with 3x3 or 5x5 square
+
+        :param size: Size of square
+        :type  size: int
+        :rtype:      Node
+        """
+        if size not in (3, 5):
+            raise ValueError("Undefined size: {}. Available sizes: 3 or 5".format(size))
+        return self.pipeline._node("correlate", (self,), "gauss{}".format(size))
+
+    def gauss(self, sigma):
+        """
+        Gauss smoothing with any standard deviation (float32 result)
+
+        :param sigma: Standard deviation
+        :type  sigma: float
+        :rtype:       Node
+        """
+        return self.pipeline._node("gauss", (self,), float(sigma))
+
+    def laplacian(self):
+        """
+        Second-order derivative approximations with 3x3 Laplacian operator
+
+        :rtype: Node
+        """
+        return self.pipeline._node("correlate", (self,), "laplacian")
+
+    def log(self, sigma):
+        """
+        Negative Laplacian of Gaussian (float32 result)
+
+        :param sigma: Standard deviation
+        :type  sigma: float
+        :rtype:       Node
+        """
+        return self.pipeline._node("log", (self,), float(sigma))
+
+    def dog(self, sigma):
+        """
+        Difference of Gaussians with sigma and DOG_RATIO * sigma
+
+        :param sigma: Standard deviation of the smaller Gauss filter
+        :type  sigma: float
+        :rtype:       Node
+        """
+        return self.gauss(sigma)._map((("subtract", 1),), self.gauss(DOG_RATIO * sigma))
+
+    def clip(self, low = 0):
+        """
+        Raising shades under low to low
+
+        :param low: The lowest shade
+        :type  low: float
+        :rtype:     Node
+        """
+        return self._map((("clip", low),))
+
+    def stretch(self, low, high):
+        """
+        Linear stretching of shades to low - high
+
+        :param low:  The lowest shade of result
+        :type  low:  float
+        :param high: The highest shade of result
+        :type  high: float
+        :rtype:      Node
+        """
+        return self._map((("stretch", low, high),))
+
+    def add(self, value):
+        """
+        Adding value to every shade
+
+        :param value: Added value
+        :type  value: float
+        :rtype:       Node
+        """
+        return self._map((("affine", 1, value),))
+
+    def lsLaplacian(self, coef = 1024):
+        """
+        Lower Laplacian shade range to 1 - coef + 1 (the same steps as EdgeStrength._lsLaplacian())
+
+        :param coef: Maximum value of Laplacian shades
+        :type  coef: float
+        :rtype:      Node
+        """
+        return self._map(lsLaplacianSteps(coef))
+
+    def strengthen(self):
+        """
+        Multiplying shades of edges with original image (the same steps as EdgeStrength.strengtheningEdges())
+
+        :rtype: Node
+        """
+        return self._map(STRENGTHEN_STEPS, self.pipeline.source)
+
+    def _map(self, steps, *others):
+        """
+        Elementwise steps of node (see elementwise.applySteps())
+
+        :param steps:  Steps with their parameters (other images are indexes of inputs)
+        :type  steps:  tuple
+        :param others: Other images of steps
+        :type  others: Node
+        :rtype:        Node
+        """
+        return self.pipeline._node("map", (self,) + others, tuple(steps))
+
+class Pipeline:
+    """
+    Graph of lazy operations on greyscale image. Evaluation computes every node once,
+    keeps its result only until the last node using it is computed and fuses chains of
+    elementwise steps into one buffer (consecutive linear steps are one multiplication and addition).
+    With enabled cache results of other operations are kept between runs
+
+    :ivar    source: Node of loaded image, converted to greyscale
+    :vartype source: Node
+    :ivar    height: Height of image
+    :vartype height: int
+    :ivar    width:  Width of image
+    :vartype width:  int
+    """
+    def __init__(self, inImg):
+        # Load image (or use already loaded one) and convert it to greyscale
+        # (greyscale image of file can come from cache)
+        img = cache.loadGreyscale(inImg)
+        if img is None:
+            raise IOError("Can't read image: {}".format(inImg))
+        # Rows
+        self.height = img.shape[0]
+        # Columns
+        self.width = img.shape[1]
+        # Nodes by operation, inputs and parameters
+        self._nodes = {}
+        self._image = img
+        self.source = self._node("source", (), None)
+        # Padded input and scratch arrays of correlation, float32 arrays of Gauss filters
+        self._padded = PaddedImage(self.height, self.width, 2)
+        self._scratch = np.empty((self.height, self.width))
+        self._tmp = np.empty((self.height, self.width + 4))
+        self._gaussBuffers = None
+
+    def _node(self, op, inputs, params):
+        """
+        Getting node of operation (created only once)
+
+        :param op:     Operation
+        :type  op:     str
+        :param inputs: Input nodes
+        :type  inputs: tuple
+        :param params: Parameters of operation
+        :type  params: object
+        :rtype:        Node
+        """
+        key = (op, inputs, params)
+        if key not in self._nodes:
+            self._nodes[key] = Node(self, op, inputs, params)
+
+        return self._nodes[key]
+
+    def evaluate(self, nodes):
+        """
+        Computing images of nodes
+
+        :param nodes: Nodes of result images
+        :type  nodes: list
+        :return:      Images of nodes (source image is not copied)
+        :rtype:       list
+        """
+        # Results of operations which are not elementwise can be in cache,
+        # their inputs are not computed then
+        stored = {}
+        keys = {}
+        def find(node):
+            if node not in keys:
+                inputKeys = [find(inp) for inp in node.inputs]
+                if node.op == "source":
+                    keys[node] = cache.imageKey(self._image)
+                elif None not in inputKeys:
+                    # Registered kernel can be replaced, so key has its coefficients
+                    params = ((kernels.getKernel(node.params), kernels.getDivisor(node.params))
+                        if node.op == "correlate" else node.params)
+                    keys[node] = cache.digest(node.op, node.params, params, *inputKeys)
+                else:
+                    keys[node] = None
+                if node.op not in ("source", "map"):
+                    img = cache.get(keys[node])
+                    if img is not None:
+                        stored[node] = img
+            return keys[node]
+        for node in nodes:
+            find(node)
+
+        # Nodes in order of computing and amount of their uses by other nodes and by result
+        order = []
+        uses = {}
+        def visit(node):
+            if node not in uses:
+                uses[node] = 0
+                if node not in stored:
+                    for inp in node.inputs:
+                        visit(inp)
+                        uses[inp] += 1
+                order.append(node)
+        for node in nodes:
+            visit(node)
+        for node in nodes:
+            uses[node] += 1
+
+        # Map used only as the first input of next map is computed in its buffer
+        fused = {node for node in order
+            if node.op == "map" and uses[node] == 1 and node not in nodes and any(
+                other.op == "map" and other.inputs[0] is node for other in order)}
+
+        values = {}
+        for node in order:
+            if node in fused:
+                continue
+            if node in stored:
+                read = []
+                values[node] = np.array(stored[node])
+            elif node.op == "map":
+                chain = [node]
+                while chain[0].inputs[0] in fused:
+                    chain.insert(0, chain[0].inputs[0])
+                read = [inp for link in chain for inp in link.inputs if inp not in fused]
+                base = read[0]
+                values[node] = self._map(chain, values, uses[base] == 1 and base not in nodes and base.op != "source")
+            else:
+                read = list(node.inputs)
+                values[node] = self._compute(node, [values[inp] for inp in read])
+                if node.op != "source":
+                    cache.put(keys[node], values[node])
+            # Results which are not needed anymore are released
+            for inp in read:
+                uses[inp] -= 1
+                if uses[inp] == 0:
+                    del values[inp]
+
+        return [values[node] for node in nodes]
+
+    def _compute(self, node, inputs):
+        """
+        Computing image of node which is not elementwise
+
+        :param node:   Node
+        :type  node:   Node
+        :param inputs: Images of inputs
+        :type  inputs: list
+        :return:       Image
+        :rtype:        numpy
+        """
+        if node.op == "source":
+            return self._image
+
+        if node.op == "correlate":
+            kernel = kernels.getKernel(node.params)
+            self._padded.load(inputs[0])
+            expImg = self._padded.expanded(kernel.shape[0] // 2)
+            return kernels.correlateRegistered(expImg, node.params, np.empty((self.height, self.width)),
+                scratch=self._scratch, tmp=self._tmp[:, :expImg.shape[1]])
+
+        if self._gaussBuffers is None:
+            self._gaussBuffers = [np.empty((self.height, self.width), dtype=np.float32) for _ in range(3)]
+        if node.op == "gauss":
+            return gaussian.gaussFilter(inputs[0], node.params, tmp=self._gaussBuffers[:2])
+        if node.op == "log":
+            return gaussian.logFilter(inputs[0], node.params, tmp=self._gaussBuffers)
+
+        raise ValueError('Undefined operation: {}. Available operations: "source", "correlate", "gauss", "log" or "map"'.format(node.op))
+
+    @staticmethod
+    def _map(chain, values, reuse):
+        """
+        Computing fused elementwise steps of chain of map nodes in one buffer
+
+        :param chain:  Map nodes, every one transforms result of previous one
+        :type  chain:  list
+        :param values: Images of computed nodes
+        :type  values: dict
+        :param reuse:  Image of the first input is not needed anymore and can be overwritten
+        :type  reuse:  bool
+        :return:       Image
+        :rtype:        numpy
+        """
+        resImg = values[chain[0].inputs[0]]
+        if not reuse or resImg.dtype != np.float64:
+            resImg = resImg.astype(np.float64)
+        # Steps of all nodes, their indexes of other images are positions in images of chain
+        steps = []
+        images = [resImg]
+        for node in chain:
+            for step in node.params:
+                if step[0] in ("multiply", "subtract"):
+                    images.append(values[node.inputs[step[1]]])
+                    step = (step[0], len(images) - 1)
+                steps.append(step)
+
+        return applySteps(resImg, steps, images)
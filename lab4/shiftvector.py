@@ -3,17 +3,20 @@ import numpy as np
 import cv2
 
 class ShiftVector:
-    def __init__(self, pathList, blockSize, step, windowSize):
+    def __init__(self, pathList, blockSize, step, windowSize, show=True):
         self.BLOCK_SIZE = [int(blockSize), int(blockSize)]
         self.STEP_SIZE = int(step)
         self.WINDOW_SIZE = int(windowSize)
+        self.show = show
 
-        self.t_1 = cv2.imread(pathList[0], 0)
-        self.t = cv2.imread(pathList[1], 0)
+        # Frames are paths or already loaded greyscale images
+        self.t_1 = pathList[0] if isinstance(pathList[0], np.ndarray) else cv2.imread(pathList[0], 0)
+        self.t = pathList[1] if isinstance(pathList[1], np.ndarray) else cv2.imread(pathList[1], 0)
 
-        cv2.imshow("1 Frame", self.t_1)
-        cv2.imshow("2 Frame", self.t)
-        cv2.waitKey(0)
+        if self.show:
+            cv2.imshow("1 Frame", self.t_1)
+            cv2.imshow("2 Frame", self.t)
+            cv2.waitKey(0)
 
         self.t_rec = self.t_1.copy()
         self.t_vec = self.t_1.copy()
@@ -133,5 +136,6 @@ class ShiftVector:
             self.replace_block(self.t_rec, im_w, self.BLOCK_SIZE, x_block, y_block)
             cv2.line(self.t_vec, (to_y, to_x), (y_block, x_block), (random.randint(0, 256)), 1, 8, 0)
 
-        cv2.imshow("Restored 1 frame", self.t_rec)
-        cv2.imshow("Shift vectors", self.t_vec)
\ No newline at end of file
+        if self.show:
+            cv2.imshow("Restored 1 frame", self.t_rec)
+            cv2.imshow("Shift vectors", self.t_vec)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import random
 import numpy as np
 import cv2
+import greyscale
 
 class ObjectRectangle:
     def __init__(self, path, time):
@@ -42,20 +43,7 @@ class ObjectRectangle:
         """
         Converting RGB image to greyscale
         """
-        # Get color arrays
-        red   = img[...,2]
-        green = img[...,1]
-        blue  = img[...,0]
-        
-        # Fill array with shades of grey
-        outImg = np.zeros((img.shape[0], img.shape[1]))
-        outImg[...] = 0.299 * red + 0.587 * green + 0.114 * blue
-        
-        # Round result shades
-        outImg = np.round(outImg)
-        
-        # Update image
-        return outImg
+        return greyscale.toGreyscale(img)
 
     def getCoordinates(self):
         return self.coord
@@ -68,6 +56,16 @@ class Tracker:
         self.imgCoordList.append(coord)
         self.fix_coord()
 
+        if isinstance(path, list):
+            # Frames are already loaded
+            for count, image in enumerate(path[:frameCount]):
+                if len(image.shape) == 3:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                self.imgList.append(image)
+                if count > 0:
+                    self.imgCoordList.append(None)
+            return
+
         video = cv2.VideoCapture(path)
         video.set(0, time)
         count = 0
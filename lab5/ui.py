@@ -8,7 +8,11 @@ from PyQt5.QtWidgets import (QApplication, QFileDialog, QHBoxLayout, QLabel,
         QPushButton, QSizePolicy, QSlider, QStyle, QVBoxLayout, QWidget)
 from PyQt5.QtWidgets import QMainWindow,QWidget, QPushButton, QAction, QLineEdit, QDesktopWidget
 from PyQt5.QtGui import QIcon
-import sys
+import os, sys
+
+# Modules shared by labs are in common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common"))
+
 from tracker import ObjectRectangle, Tracker
 
 class MainWindow(QWidget):